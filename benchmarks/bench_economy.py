@@ -0,0 +1,179 @@
+"""
+Benchmarks the economy object model (schemas, items, inventories and asset
+catalogs) on synthetic payloads served by api.replay_transport, so no
+network or API key is needed. Reports the best time out of a few rounds and
+the peak memory allocated during one of them.
+
+    $ python benchmarks/bench_economy.py [--sizes 1000,10000,100000]
+                                         [--save results.json]
+                                         [--compare baseline.json]
+
+--compare exits with status 1 if anything got slower (or hungrier) than
+the baseline by more than --tolerance, 25% by default.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from steam import api
+from steam import items
+from steam import sim
+
+import fixtures
+
+STEAMID = 76561198000000000
+
+
+def install_fixtures(replay, size):
+    """ Adds every payload for the given size to the replay directory """
+    base = "https://api.steampowered.com/{0}/{1}/v1?format=json&{2}"
+
+    replay.add(base.format("IEconItems_570", "GetSchema", "language=en_US"),
+               json.dumps(fixtures.schema_payload(size)))
+    replay.add(base.format("IEconItems_570", "GetPlayerItems", "SteamID={0}".format(STEAMID)),
+               json.dumps(fixtures.inventory_payload(size, size)))
+    replay.add(base.format("ISteamEconomy", "GetAssetPrices", "appid=570&language=en_US"),
+               json.dumps(fixtures.asset_prices_payload(size)))
+    replay.add("http://steamcommunity.com/inventory/{0}/753/6?l=english&count={1}".format(STEAMID, size),
+               json.dumps(fixtures.sim_inventory_payload(size)))
+
+
+def measure(func, setup, rounds):
+    """ Returns (best seconds, peak bytes) of func(setup()), setup isn't measured """
+    best = None
+
+    for i in range(rounds):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    arg = setup()
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def fetched_schema():
+    schema = items.schema(570, lang="en_US")
+    schema._api["result"]
+    return schema
+
+
+def built_schema():
+    schema = fetched_schema()
+    schema._schema
+    return schema
+
+
+def benchmarks(size):
+    """ Yields (name, func, setup) for everything measured at the given size """
+    schema = built_schema()
+
+    def raw_items():
+        return list(items.inventory(STEAMID, 570)._inv["items"])
+
+    def wrapped_items():
+        return [items.item(raw, schema) for raw in raw_items()]
+
+    def inventory():
+        inv = items.inventory(STEAMID, 570, schema)
+        inv._inv
+        return inv
+
+    def sim_inventory():
+        inv = sim.inventory(STEAMID, 753, 6, page_size=size)
+        inv._inv
+        return inv
+
+    def catalog():
+        assets = items.assets(570, lang="en_US")
+        assets._assets
+        return assets
+
+    def lookups(assets):
+        for i in range(size):
+            key = str(i)
+            if key in assets:
+                assets[key].price
+
+    yield "schema._schema", lambda s: s._schema, fetched_schema
+    yield "item.__init__", lambda raws: [items.item(raw, schema) for raw in raws], raw_items
+    yield "item.attributes", lambda its: [i.attributes for i in its], wrapped_items
+    yield "item.full_name", lambda its: [i.full_name for i in its], wrapped_items
+    yield "item.rank", lambda its: [i.rank for i in its], wrapped_items
+    yield "items.inventory iteration", lambda inv: [i.id for i in inv], inventory
+    yield "sim.inventory iteration", lambda inv: [i.full_name for i in inv], sim_inventory
+    yield "assets lookups", lookups, catalog
+
+
+def compare(results, baseline, tolerance):
+    """ Prints what regressed against the baseline, returns True if anything did """
+    regressed = False
+
+    for key, (seconds, peak) in sorted(results.items()):
+        if key not in baseline:
+            continue
+
+        base_seconds, base_peak = baseline[key]
+        for what, now, then in (("time", seconds, base_seconds), ("memory", peak, base_peak)):
+            if then and now > then * (1 + tolerance):
+                print("REGRESSION {0} {1}: {2:+.0%}".format(key, what, now / then - 1))
+                regressed = True
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Economy object model benchmarks")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated item counts to generate")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    results = {}
+    api.key.set("benchmark")
+    api.http_transport.set(api.replay_transport(path))
+
+    try:
+        for size in [int(s) for s in args.sizes.split(',')]:
+            install_fixtures(api.http_transport.get(), size)
+            print("{0} items".format(size))
+
+            for name, func, setup in benchmarks(size):
+                seconds, peak = measure(func, setup, args.rounds)
+                results["{0} @{1}".format(name, size)] = (seconds, peak)
+                print("  {0:<28} {1:>9.1f} ms {2:>9.1f} MiB peak".format(name, seconds * 1000,
+                                                                       peak / 1048576.0))
+    finally:
+        api.http_transport.set(None)
+        shutil.rmtree(path)
+
+    if args.save:
+        with open(args.save, "w") as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as base:
+            if compare(results, json.load(base), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Measures how long importing parts of the package takes in a fresh
+interpreter, which is what short lived scripts pay on every run.
+
+    $ python benchmarks/bench_import.py [runs]
+"""
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+STATEMENTS = [
+    "import steam",
+    "from steam import api",
+    "from steam import user",
+    "from steam import items",
+    "from steam import sim",
+    "from steam import *",
+]
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+{0}
+elapsed = time.perf_counter() - start
+import sys
+print(elapsed, len([m for m in sys.modules if m.startswith("steam")]))
+"""
+
+
+def measure(statement, runs):
+    """ Returns the median import time in seconds and how many steam
+    modules ended up loaded """
+    times = []
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="")
+
+    for i in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", SCRIPT.format(statement)], env=env)
+        elapsed, modules = out.split()
+        times.append(float(elapsed))
+
+    return sorted(times)[len(times) // 2], int(modules)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+
+    # Make sure bytecode is cached so the first run isn't an outlier
+    measure(STATEMENTS[-1], 1)
+
+    for statement in STATEMENTS:
+        seconds, modules = measure(statement, runs)
+        print("{0:<26} {1:>7.1f} ms {2:>3} steam modules".format(statement, seconds * 1000, modules))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares the old decode-then-parse path of method_result with
+api.decode_json on a GetSchemaItems sized payload.
+
+    $ python benchmarks/bench_json.py [items]
+"""
+
+import os
+import sys
+import json
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from steam import api
+
+
+def schema_items_payload(count):
+    items = []
+
+    for i in range(count):
+        items.append({
+            "defindex": i,
+            "name": "Item {0}".format(i),
+            "item_class": "tf_wearable",
+            "item_type_name": "Hat",
+            "item_name": "Item {0} ™".format(i),
+            "item_description": "A hat that is definitely a hat, number {0}".format(i),
+            "proper_name": False,
+            "item_slot": "head",
+            "model_player": "models/player/items/all_class/hat_{0}.mdl".format(i),
+            "item_quality": 6,
+            "image_inventory": "backpack/player/items/all_class/hat_{0}".format(i),
+            "min_ilevel": 1,
+            "max_ilevel": 100,
+            "image_url": "http://media.steampowered.com/apps/440/icons/hat_{0}.png".format(i),
+            "image_url_large": "http://media.steampowered.com/apps/440/icons/hat_{0}_large.png".format(i),
+            "craft_class": "hat",
+            "craft_material_type": "hat",
+            "capabilities": {"nameable": True, "can_gift_wrap": True, "can_craft_mark": True},
+            "used_by_classes": ["Scout", "Soldier", "Pyro"],
+            "attributes": [{"name": "kill eater score type", "class": "kill_eater_score_type", "value": 64}],
+        })
+
+    return json.dumps({"result": {"status": 1, "items": items, "next": count}}).encode("utf-8")
+
+
+def legacy_decode(data):
+    return json.loads(data.decode("utf-8", errors="ignore"))
+
+
+def measure(name, func, data, rounds=5):
+    best = None
+
+    for i in range(rounds):
+        start = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print("{0:<28} {1:>9.1f} ms {2:>9.1f} MiB peak".format(name, best * 1000, peak / 1048576.0))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = schema_items_payload(count)
+
+    print("{0} items, {1:.1f} MiB payload, orjson {2}".format(count, len(data) / 1048576.0,
+                                                            "available" if api.orjson else "missing"))
+    measure("decode + json.loads", legacy_decode, data)
+    measure("json.loads(bytes)", json.loads, data)
+    measure("api.decode_json", api.decode_json, data)
+
+
+if __name__ == "__main__":
+    main()
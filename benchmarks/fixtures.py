@@ -0,0 +1,184 @@
+"""
+Generates synthetic but realistically shaped economy payloads: item
+schemas, GetPlayerItems inventories, community (SIM) inventories and asset
+price catalogs. Output is deterministic for a given size and seed.
+"""
+
+import random
+
+QUALITIES = [("normal", 0, "Normal"), ("genuine", 1, "Genuine"), ("vintage", 3, "Vintage"),
+             ("unusual", 5, "Unusual"), ("unique", 6, "Unique"), ("community", 7, "Community"),
+             ("selfmade", 9, "Self-Made"), ("strange", 11, "Strange"), ("haunted", 13, "Haunted"),
+             ("collectors", 14, "Collector's")]
+
+ORIGINS = ["Timed Drop", "Achievement", "Purchased", "Traded", "Crafted", "Store Promotion",
+           "Gifted", "Support Granted", "Found in Crate", "Earned", "Third-Party Promotion"]
+
+CLASSES = ["Scout", "Soldier", "Pyro", "Demoman", "Heavy", "Engineer", "Medic", "Sniper", "Spy"]
+
+SLOTS = ["primary", "secondary", "melee", "head", "misc", "action", "pda"]
+
+KILL_EATER = 214
+KILL_EATER_SCORE_TYPE = 292
+
+# The attributes the generated items refer to, the rest are filler
+NAMED_ATTRIBUTES = [
+    (KILL_EATER, "kill eater", "kill_eater", "value_is_additive", "positive", True),
+    (KILL_EATER_SCORE_TYPE, "kill eater score type", "kill_eater_score_type", "value_is_additive", "neutral", True),
+    (2, "damage bonus", "mult_dmg", "value_is_percentage", "positive", False),
+    (1, "damage penalty", "mult_dmg", "value_is_percentage", "negative", False),
+    (134, "attach particle effect", "set_attached_particle", "value_is_particle_index", "positive", False),
+    (142, "set item tint RGB", "set_item_tint_rgb", "value_is_additive", "positive", False),
+    (153, "cannot trade", "cannot_trade", "value_is_additive", "negative", True),
+    (186, "gifter account id", "gifter_account_id", "value_is_account_id", "positive", True),
+    (187, "set supply crate series", "supply_crate_series", "value_is_additive", "positive", False),
+    (228, "makers mark id", "makers_mark_id", "value_is_account_id", "positive", True),
+]
+
+
+def schema_payload(count, attribute_count=1500, seed=0):
+    """ A GetSchema response with 'count' items """
+    rnd = random.Random(seed)
+    attributes = []
+
+    for defindex, name, attrclass, fmt, effect, isint in NAMED_ATTRIBUTES:
+        attributes.append({"name": name, "defindex": defindex, "attribute_class": attrclass,
+                           "description_string": name.capitalize() + ": %s1", "description_format": fmt,
+                           "effect_type": effect, "hidden": False, "stored_as_integer": isint})
+
+    for i in range(1000, 1000 + attribute_count - len(attributes)):
+        attributes.append({"name": "filler attribute {0}".format(i), "defindex": i,
+                           "attribute_class": "filler_{0}".format(i),
+                           "description_string": "+%s1% filler {0}".format(i),
+                           "description_format": "value_is_percentage",
+                           "effect_type": rnd.choice(("positive", "negative", "neutral")),
+                           "hidden": rnd.random() < 0.3, "stored_as_integer": False})
+
+    items = []
+    for i in range(count):
+        item = {"name": "Item_{0}".format(i),
+                "defindex": i,
+                "item_class": "tf_weapon_{0}".format(i % 40),
+                "item_type_name": "Weapon Type {0}".format(i % 40),
+                "item_name": "Item {0}".format(i),
+                "item_description": "Description of item {0}".format(i),
+                "proper_name": rnd.random() < 0.2,
+                "item_slot": rnd.choice(SLOTS),
+                "item_quality": 6,
+                "image_inventory": "backpack/weapons/w_models/item_{0}".format(i),
+                "min_ilevel": 1,
+                "max_ilevel": 100,
+                "image_url": "http://media.steampowered.com/apps/440/icons/item_{0}.png".format(i),
+                "image_url_large": "http://media.steampowered.com/apps/440/icons/item_{0}_large.png".format(i),
+                "craft_class": "weapon",
+                "craft_material_type": "weapon",
+                "capabilities": {"nameable": True, "can_gift_wrap": True, "can_craft_mark": True,
+                                 "strange_parts": True},
+                "used_by_classes": rnd.sample(CLASSES, rnd.randint(1, 3)),
+                "attributes": [{"name": name, "class": attrclass, "value": round(rnd.uniform(0.5, 1.5), 2)}
+                               for defindex, name, attrclass, fmt, effect, isint
+                               in rnd.sample(NAMED_ATTRIBUTES[2:6], rnd.randint(0, 3))]}
+
+        if i % 10 == 0:
+            item["styles"] = [{"name": "Style {0}".format(s)} for s in range(3)]
+
+        items.append(item)
+
+    levels = [{"level": n, "required_score": n * n * 10, "name": "Rank {0}".format(n)} for n in range(21)]
+
+    return {"result": {
+        "status": 1,
+        "items_game_url": "http://media.steampowered.com/apps/440/scripts/items/items_game.txt",
+        "qualities": dict((name, qid) for name, qid, locname in QUALITIES),
+        "qualityNames": dict((name, locname) for name, qid, locname in QUALITIES),
+        "originNames": [{"origin": i, "name": name} for i, name in enumerate(ORIGINS)],
+        "attributes": attributes,
+        "attribute_controlled_attached_particles": [{"system": "particle_{0}".format(p), "id": p,
+                                                     "attach_to_rootbone": False, "name": "Effect {0}".format(p)}
+                                                    for p in range(200)],
+        "item_levels": [{"name": "KillEaterRank", "levels": levels}],
+        "kill_eater_score_types": [{"type": 0, "type_name": "Kills", "level_data": "KillEaterRank"}],
+        "items": items}}
+
+
+def inventory_payload(count, schema_size, seed=0):
+    """ A GetPlayerItems response with 'count' items drawn from a schema of
+    'schema_size' items. About a third of them are strange. """
+    rnd = random.Random(seed)
+    items = []
+
+    for i in range(count):
+        strange = rnd.random() < 0.33
+        item = {"id": 1000000000 + i,
+                "original_id": 900000000 + i,
+                "defindex": rnd.randrange(schema_size),
+                "level": rnd.randint(1, 100),
+                "quality": 11 if strange else rnd.choice((6, 6, 6, 1, 3, 5)),
+                "inventory": 0x80000000 | (i + 1),
+                "quantity": 1,
+                "origin": rnd.randrange(len(ORIGINS)),
+                "attributes": [{"defindex": 186, "value": rnd.randint(1, 2 ** 31)}]}
+
+        if strange:
+            item["attributes"] += [{"defindex": KILL_EATER, "value": rnd.randint(0, 5000)},
+                                   {"defindex": KILL_EATER_SCORE_TYPE, "value": 0}]
+        if rnd.random() < 0.05:
+            item["custom_name"] = "Custom name {0}".format(i)
+        if rnd.random() < 0.1:
+            item["flag_cannot_trade"] = True
+
+        items.append(item)
+
+    return {"result": {"status": 1, "num_backpack_slots": count + 100, "items": items}}
+
+
+def sim_inventory_payload(count, appid=753, contextid=6, seed=0):
+    """ A community inventory page with 'count' assets sharing count / 4
+    descriptions """
+    rnd = random.Random(seed)
+    classes = max(1, count // 4)
+    assets = []
+    descriptions = []
+
+    for c in range(classes):
+        descriptions.append({
+            "appid": appid, "classid": str(3000000 + c), "instanceid": "0",
+            "icon_url": "IzMF03bi9WpSBq-S-ekoE33L-iLqGFHVaU25ZzQNQcXdEH9myp0erksICf{0}".format(c),
+            "name": "Trading Card {0}".format(c),
+            "market_name": "Trading Card {0} (Trading Card)".format(c),
+            "market_hash_name": "{0}-Trading Card {1}".format(appid, c),
+            "name_color": "", "background_color": "", "type": "Game Trading Card",
+            "tradable": 1, "marketable": 1,
+            "descriptions": [{"type": "html", "value": "Part of set {0}".format(c % 50)},
+                             {"type": "html", "value": " "}],
+            "tags": [{"category": "Game", "internal_name": "app_{0}".format(c % 50), "name": "Game {0}".format(c % 50)},
+                     {"category": "item_class", "internal_name": "item_class_2", "name": "Trading Card"},
+                     {"category": "cardborder", "internal_name": "cardborder_0", "name": "Normal"}]})
+
+    for i in range(count):
+        assets.append({"appid": appid, "contextid": str(contextid), "assetid": str(5000000000 + i),
+                       "classid": str(3000000 + rnd.randrange(classes)), "instanceid": "0", "amount": "1"})
+
+    return {"assets": assets, "descriptions": descriptions, "total_inventory_count": count,
+            "success": 1, "rwgrsn": -2}
+
+
+def asset_prices_payload(count, seed=0):
+    """ A GetAssetPrices response with 'count' assets """
+    rnd = random.Random(seed)
+    tags = ["Hats", "Weapons", "Tools", "Misc", "New", "Limited", "Bundles", "Maps"]
+    assets = []
+
+    for i in range(count):
+        usd = rnd.randint(49, 2999)
+        asset = {"name": str(i), "date": "2024/01/01",
+                 "prices": {"USD": usd, "EUR": usd * 9 // 10, "GBP": usd * 8 // 10},
+                 "class": [{"name": "def_index", "value": str(i)}],
+                 "classid": str(20000000 + i),
+                 "tags": rnd.sample(tags, rnd.randint(1, 3))}
+        if rnd.random() < 0.1:
+            asset["original_prices"] = dict((c, p * 2) for c, p in asset["prices"].items())
+        assets.append(asset)
+
+    return {"result": {"success": True, "assets": assets,
+                       "tags": dict((t, t) for t in tags), "tag_ids": dict((t, n) for n, t in enumerate(tags))}}
@@ -11,8 +11,22 @@ __license__ = "ISC"
 __copyright__ = "Copyright (c) 2010+, " + __author__
 
 __all__ = [
-    "api", "apps", "items", "loc",
-    "remote_storage", "sim", "user", "vdf"
+    "api", "apps", "cache", "diagnostics", "items", "loc", "metrics",
+    "refresh", "remote_storage", "sim", "user", "vdf"
     ]
 
-from . import *
+
+import importlib
+
+
+def __getattr__(name):
+    """ Submodules are imported on first access, so that importing one
+    part of the package doesn't pay for all the others """
+    if name in __all__:
+        return importlib.import_module("." + name, __name__)
+
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -5,22 +5,75 @@ Distributed under the ISC License (see LICENSE)
 """
 
 import os
+import io
 import json
+import base64
+import codecs
+import hashlib
+import tempfile
 import socket
-import sys
+import ssl
+import threading
+import time
+import zlib
+import random
+from email.utils import parsedate_tz, mktime_tz
+
+# asyncio and concurrent.futures are imported by the functions using them,
+# they take longer to import than the rest of the package together
+
+# orjson parses straight from bytes and is a lot faster, use it if it's there
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Python 2 <-> 3 glue
 try:
-    from urllib.request import urlopen
+    from http import client as httplib
+    from urllib.request import urlopen, getproxies, proxy_bypass, proxy_bypass_environment
     from urllib.request import Request as urlrequest
-    from urllib.parse import urlencode
+    from urllib.parse import urlencode, urljoin, urlsplit, urlunsplit, parse_qsl, unquote
     from urllib import error as urlerror
 except ImportError:
+    import httplib
     from urllib2 import urlopen
     from urllib2 import Request as urlrequest
-    from urllib import urlencode
+    from urllib import urlencode, unquote, getproxies, proxy_bypass, proxy_bypass_environment
+    from urlparse import urljoin, urlsplit, urlunsplit, parse_qsl
     import urllib2 as urlerror
 
+# Context follows asyncio tasks as well as threads
+try:
+    from contextvars import ContextVar
+except ImportError:
+    class ContextVar(object):
+        """ Per thread stand-in for Pythons without contextvars """
+        def __init__(self, name, default=None):
+            self._local = threading.local()
+            self._default = default
+
+        def get(self):
+            return getattr(self._local, "value", self._default)
+
+        def set(self, value):
+            self._local.value = value
+
+from . import cache
+
+
+def decode_json(data):
+    """ Deserializes a JSON response body without decoding it to a str
+    first. Invalid UTF-8 is skipped over like it always has been. """
+    try:
+        if orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+    except (UnicodeDecodeError, ValueError):
+        text = data.decode("utf-8", errors="ignore")
+
+    return json.loads(text)
+
 
 class SteamError(Exception):
     """ For future expansion, considering that steamodd is already no
@@ -54,6 +107,11 @@ class HTTPTimeoutError(HTTPError):
     pass
 
 
+class DeadlineExceededError(HTTPTimeoutError):
+    """ Raised when the time budget given with deadline runs out """
+    pass
+
+
 class HTTPFileNotFoundError(HTTPError):
     """ Raised for HTTP code 404 """
     pass
@@ -64,6 +122,35 @@ class HTTPInternalServerError(HTTPError):
     pass
 
 
+class ReplayMissError(APIError):
+    """ Raised by replay_transport for requests it has no recording of """
+    pass
+
+
+class HTTPForbiddenError(HTTPError):
+    """ Raised for HTTP codes 401 and 403, which usually mean a bad or revoked API key """
+    pass
+
+
+class HTTPTooManyRequestsError(HTTPError):
+    """ Raised for HTTP code 429, retry_after holds the number of seconds
+    the server asked to wait if it said so """
+
+    def __init__(self, msg, retry_after=None):
+        super(HTTPTooManyRequestsError, self).__init__(msg)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(HTTPError):
+    """ Raised instead of sending requests to an endpoint whose circuit
+    breaker is open, retry_after holds the seconds until it lets a trial
+    request through """
+
+    def __init__(self, msg, retry_after=None):
+        super(CircuitOpenError, self).__init__(msg)
+        self.retry_after = retry_after
+
+
 class key(object):
     __api_key = None
     __api_key_env_var = os.environ.get("STEAMODD_API_KEY")
@@ -100,166 +187,2508 @@ class socket_timeout(object):
         return cls.__timeout
 
 
-class _interface_method(object):
-    def __init__(self, iface, name):
-        self._iface = iface
-        self._name = name
+class _key_state(object):
+    def __init__(self, today=0):
+        self.today = today
+        self.calls = 0
+        self.errors = 0
+        self.available_at = 0
+
+
+class rotating_key_pool(object):
+    """ Spreads calls over several API keys, picking the one used least
+    today. Keys that get throttled (429) are left out of rotation for the
+    Retry-After or 'cooldown' seconds, and ones that are refused (401/403)
+    for 'revoked_cooldown' seconds. Keys that made 'daily_quota' calls
+    since midnight UTC are skipped until the next day.
+
+    If 'path' is given daily counts are saved there (by key hash) every
+    'save_interval' seconds and on save(), and picked up again on restart. """
+
+    def __init__(self, keys=(), daily_quota=100000, cooldown=60, revoked_cooldown=3600,
+                 path=None, save_interval=10):
+        self._quota = daily_quota
+        self._cooldown = cooldown
+        self._revoked_cooldown = revoked_cooldown
+        self._path = path
+        self._save_interval = save_interval
+        self._saved = time.time()
+        self._day = self._today()
+        self._persisted = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+        if path:
+            self._load()
+
+        for apikey in keys:
+            self.add(apikey)
+
+    @staticmethod
+    def _today():
+        return time.strftime("%Y-%m-%d", time.gmtime())
+
+    @staticmethod
+    def _hash(apikey):
+        return hashlib.sha1(apikey.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self._path) as counts:
+                saved = json.load(counts)
+        except (IOError, OSError, ValueError):
+            return
 
-    def __call__(self, version=1, timeout=None, since=None,
-                 aggressive=False, data={}, **kwargs):
-        kwargs.setdefault("format", "json")
-        kwargs.setdefault("key", key.get())
-        url = "https://api.steampowered.com/{0}/{1}/v{2}?{3}".format(self._iface,
-                                                                    self._name,
-                                                                    version,
-                                                                    urlencode(kwargs))
+        if saved.get("day") == self._day:
+            self._persisted = saved.get("counts", {})
 
-        return method_result(url, last_modified=since, timeout=timeout, aggressive=aggressive, data=data)
+    def save(self):
+        """ Writes today's counts to 'path' """
+        if not self._path:
+            return
 
+        with self._lock:
+            counts = dict(self._persisted)
+            counts.update((self._hash(k), s.today) for k, s in self._keys.items())
+            saved = {"day": self._day, "counts": counts}
+            self._saved = time.time()
 
-class interface(object):
-    def __init__(self, iface):
-        self._iface = iface
+        dirname = os.path.dirname(os.path.abspath(self._path))
+        fd, tmpname = tempfile.mkstemp(dir=dirname, prefix=".tmp")
 
-    def __getattr__(self, name):
-        return _interface_method(self._iface, name)
+        try:
+            with os.fdopen(fd, "w") as out:
+                json.dump(saved, out)
+            os.replace(tmpname, self._path)
+        except:
+            os.unlink(tmpname)
+            raise
 
+    def add(self, apikey):
+        apikey = str(apikey)
 
-class http_downloader(object):
-    def __init__(self, url, last_modified=None, timeout=None, data={}):
-        self._user_agent = "Mozilla/5.0 (Windows; U; Windows NT 6.1; en-US; Valve Steam Client/1366845241; ) AppleWebKit/535.15 (KHTML, like Gecko) Chrome/18.0.989.0 Safari/535.11"
-        self._url = url
-        self._timeout = timeout or socket_timeout.get()
-        self._last_modified = last_modified
-        self._data = None
+        with self._lock:
+            if apikey not in self._keys:
+                self._keys[apikey] = _key_state(self._persisted.get(self._hash(apikey), 0))
 
-        if data:
-            self._data = data
+    def remove(self, apikey):
+        with self._lock:
+            self._keys.pop(str(apikey), None)
 
-    def _build_headers(self):
-        head = {}
+    def __contains__(self, apikey):
+        return apikey in self._keys
 
-        if self._last_modified:
-            head["If-Modified-Since"] = str(self._last_modified)
+    def _rollover(self):
+        today = self._today()
 
-        if self._user_agent:
-            head["User-Agent"] = str(self._user_agent)
+        if today != self._day:
+            self._day = today
+            self._persisted = {}
+            for state in self._keys.values():
+                state.today = 0
 
-        return head
+    def _usable(self, state, now):
+        return state.available_at <= now and state.today < self._quota
 
-    def download(self):
-        head = self._build_headers()
-        status_code = -1
-        body = ''
+    def available(self, apikey):
+        """ True if the key is in rotation right now """
+        state = self._keys.get(apikey)
+
+        with self._lock:
+            self._rollover()
+            return state is not None and self._usable(state, time.time())
+
+    def peek(self):
+        """ Returns the key the next call would use without counting it,
+        or any key in the pool if none is usable right now. Requests are
+        built with it and only pick and count their key once they're sent. """
+        now = time.time()
+
+        with self._lock:
+            self._rollover()
+            usable = [(s.today, k) for k, s in self._keys.items() if self._usable(s, now)]
+            if not usable:
+                usable = [(s.today, k) for k, s in self._keys.items()]
+
+        if not usable:
+            raise APIKeyMissingError("No API key in the pool")
+
+        return min(usable)[1]
+
+    def acquire(self):
+        """ Returns the key to use for the next call and counts the call """
+        now = time.time()
+
+        with self._lock:
+            self._rollover()
+            usable = [(s.today, k) for k, s in self._keys.items() if self._usable(s, now)]
+
+            if not usable:
+                raise APIKeyMissingError("No API key in the pool is available")
+
+            apikey = min(usable)[1]
+            state = self._keys[apikey]
+            state.today += 1
+            state.calls += 1
+            save = self._path and now - self._saved >= self._save_interval
+
+        if save:
+            self.save()
+
+        return apikey
+
+    def throttled(self, apikey, retry_after=None):
+        self._failed(apikey, retry_after or self._cooldown)
+
+    def revoked(self, apikey):
+        self._failed(apikey, self._revoked_cooldown)
+
+    def _failed(self, apikey, cooldown):
+        with self._lock:
+            state = self._keys.get(apikey)
+            if state:
+                state.errors += 1
+                state.available_at = max(state.available_at, time.time() + cooldown)
+
+    @property
+    def stats(self):
+        """ Calls made today and overall, errors and seconds left until it's
+        back in rotation, per key """
+        now = time.time()
+
+        with self._lock:
+            self._rollover()
+            return dict((k, {"today": s.today, "calls": s.calls, "errors": s.errors,
+                             "cooldown": max(0, s.available_at - now)})
+                        for k, s in self._keys.items())
+
+
+class key_pool(object):
+    """ Pool interface methods take their API keys from, disabled by default.
+    Set it to a rotating_key_pool to spread calls over several keys, in
+    place of the single one from 'key'. """
+    __pool = None
+
+    @classmethod
+    def set(cls, value):
+        cls.__pool = value
+
+    @classmethod
+    def get(cls):
+        return cls.__pool
+
+
+class transport(object):
+    """ Base class for what downloaders send requests through. request()
+    returns a response with status, reason and headers attributes and
+    read(amt=None) and close() methods, following redirects on its own.
+    Socket errors are left to propagate, failed connects should be raised
+    as urllib's URLError. """
+
+    def request(self, url, headers={}, data=None, timeout=None):
+        raise NotImplementedError
+
+
+def _proxy_for(scheme, host, proxies=None):
+    """ Returns the (host, port, Proxy-Authorization value) of the proxy to
+    reach host through, or None to connect directly. 'proxies' maps schemes
+    to proxy URLs (and "no" to hosts to bypass them for) like getproxies()
+    does, by default the proxies set in the environment (HTTP_PROXY,
+    HTTPS_PROXY and NO_PROXY) or system settings are used, as urlopen would. """
+    if proxies is None:
+        proxies = getproxies()
+        proxy = proxies.get(scheme)
+        bypass = proxy and proxy_bypass(host)
+    else:
+        proxy = proxies.get(scheme)
+        bypass = proxy and proxy_bypass_environment(host, proxies)
+
+    if not proxy or bypass:
+        return None
+
+    if "://" not in proxy:
+        proxy = "http://" + proxy
+
+    parts = urlsplit(proxy)
+    auth = None
+
+    if parts.username:
+        creds = "{0}:{1}".format(unquote(parts.username), unquote(parts.password or ''))
+        auth = "Basic " + base64.b64encode(creds.encode("utf-8")).decode("ascii")
+
+    return parts.hostname, parts.port or 80, auth
+
+
+class connection_pool(transport):
+    """ Thread-safe pool of persistent HTTP connections. Connections are kept
+    per scheme/host/port so that consecutive requests to the same server skip
+    the TCP and TLS handshakes. At most 'maxsize' idle connections are kept per
+    host, and connections that sat idle for more than 'idle_timeout' seconds
+    are closed instead of being reused.
+
+    Proxies are used the same way urlopen uses them, from HTTP_PROXY,
+    HTTPS_PROXY and NO_PROXY, unless 'proxies' (a dict like
+    {"https": "http://proxy:3128", "no": "localhost"}) is given instead.
+    HTTPS goes through a CONNECT tunnel. """
+
+    _redirect_codes = (301, 302, 303, 307, 308)
+
+    def __init__(self, maxsize=10, idle_timeout=60, max_redirects=5, proxies=None):
+        self._maxsize = maxsize
+        self._idle_timeout = idle_timeout
+        self._max_redirects = max_redirects
+        self._proxies = proxies
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, origin, timeout):
+        scheme, host, port, proxy = origin
+        address = proxy[:2] if proxy else (host, port)
+
+        if scheme == "https":
+            conn = httplib.HTTPSConnection(address[0], address[1], timeout=timeout)
+            if proxy:
+                conn.set_tunnel(host, port, headers={"Proxy-Authorization": proxy[2]} if proxy[2] else None)
+        else:
+            conn = httplib.HTTPConnection(address[0], address[1], timeout=timeout)
 
         try:
-            if self._data:
-                url_req = urlrequest(self._url, headers=head, data=urlencode(self._data))
-            else:
-                url_req = urlrequest(self._url, headers=head);
+            conn.connect()
+        except socket.timeout:
+            conn.close()
+            raise
+        except socket.error as E:
+            # Same as what urlopen raises for failed connects
+            conn.close()
+            raise urlerror.URLError(E)
 
-            req = urlopen(url_req, timeout=self._timeout)
-            status_code = req.code
-            body = req.read()
-        except urlerror.HTTPError as E:
-            code = E.getcode()
-            # More portability hax (no reason property in 2.6?)
+        return conn
+
+    def _acquire(self, origin, timeout):
+        """ Returns a (connection, reused) tuple """
+        conn = None
+        now = time.time()
+
+        with self._lock:
+            idle = self._idle.get(origin, [])
+            while idle:
+                candidate, last_used = idle.pop()
+                if now - last_used <= self._idle_timeout:
+                    conn = candidate
+                    break
+                candidate.close()
+
+        if not conn:
+            return self._connect(origin, timeout), False
+
+        conn.timeout = timeout
+        if conn.sock:
+            conn.sock.settimeout(timeout)
+
+        return conn, True
+
+    def _release(self, origin, conn):
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self._maxsize:
+                idle.append((conn, time.time()))
+                return
+
+        conn.close()
+
+    def _send(self, origin, method, path, headers, body, timeout):
+        conn, reused = self._acquire(origin, timeout)
+
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            res = conn.getresponse()
+        except Exception as E:
+            conn.close()
+            # The server may have dropped a kept-alive connection since its
+            # last use, that's only worth one more try with a fresh one
+            dropped = isinstance(E, (httplib.BadStatusLine, socket.error))
+            if not reused or not dropped or isinstance(E, socket.timeout):
+                raise
+            conn = self._connect(origin, timeout)
             try:
-                reason = E.reason
-            except AttributeError:
-                reason = "Connection error"
-
-            if code == 404:
-                raise HTTPFileNotFoundError("File not found")
-            elif code == 304:
-                raise HTTPStale(str(self._last_modified))
-            elif code == 500:
-                raise HTTPInternalServerError("Internal Server Error")
+                conn.request(method, path, body=body, headers=headers)
+                res = conn.getresponse()
+            except:
+                conn.close()
+                raise
+
+        return _pooled_response(self, origin, conn, res)
+
+    def request(self, url, headers={}, data=None, timeout=None):
+        """ Sends a request, following redirects, and returns the response.
+        The response must be closed after use to return its connection
+        to the pool. """
+        redirects = 0
+
+        while True:
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            port = parts.port or (443 if scheme == "https" else 80)
+            proxy = _proxy_for(scheme, parts.hostname, self._proxies)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            head = dict(headers)
+
+            if proxy and scheme != "https":
+                # Plain HTTP goes to the proxy with the whole URL, over
+                # connections shared by every host behind it
+                origin = (scheme, None, None, proxy)
+                path = urlunsplit((parts.scheme, parts.netloc, path, '', ''))
+                if proxy[2]:
+                    head["Proxy-Authorization"] = proxy[2]
             else:
-                raise HTTPError("Server connection failed: {0} ({1})".format(reason, code))
-        except (socket.timeout, urlerror.URLError):
-            raise HTTPTimeoutError("Server took too long to respond")
-        except socket.error as E:
-            raise HTTPError("Server read error: {0}".format(E))
+                origin = (scheme, parts.hostname, port, proxy)
 
-        lm = req.headers.get("last-modified")
-        self._last_modified = lm
+            if data is not None:
+                method = "POST"
+                head.setdefault("Content-Type", "application/x-www-form-urlencoded")
+            else:
+                method = "GET"
 
-        return body
+            res = self._send(origin, method, path, head, data, timeout)
+            location = res.headers.get("location")
 
-    @property
-    def last_modified(self):
-        return self._last_modified
+            if res.status not in self._redirect_codes or not location:
+                return res
+
+            res.read()
+            res.close()
+            redirects += 1
+
+            if redirects > self._max_redirects:
+                raise urlerror.HTTPError(url, res.status, "Too many redirects",
+                                         res.headers, None)
+
+            url = urljoin(url, location)
+            if res.status not in (307, 308):
+                data = None
+
+    def evict_idle(self):
+        """ Closes connections idle for longer than idle_timeout, returns
+        how many were closed """
+        now = time.time()
+        stale = []
+
+        with self._lock:
+            for origin, idle in self._idle.items():
+                fresh = []
+                for conn, last_used in idle:
+                    if now - last_used <= self._idle_timeout:
+                        fresh.append((conn, last_used))
+                    else:
+                        stale.append(conn)
+                idle[:] = fresh
+
+        for conn in stale:
+            conn.close()
+
+        return len(stale)
+
+    def clear(self):
+        """ Closes every idle connection """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+
+        for conns in idle.values():
+            for conn, last_used in conns:
+                conn.close()
 
     @property
-    def url(self):
-        return self._url
+    def idle_count(self):
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
 
 
-class method_result(dict):
-    """ Holds a deserialized JSON object obtained from fetching the given URL.
-    If aggressive is True then the data will be fetched when the method is called
-    instead of only when the object is actually accessed.
-    """
+class _pooled_response(object):
+    """ Response wrapper that hands its connection back to the pool once the
+    body has been read in full """
 
-    def __handle_accessor(self, method, *args, **kwargs):
-        try:
-            if not self._fetched:
-                self.call()
-        except AttributeError:
-            self._fetched = True
+    def __init__(self, pool, origin, conn, response):
+        self._pool = pool
+        self._origin = origin
+        self._conn = conn
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
 
-        return getattr(super(method_result, self), method)(*args, **kwargs)
+    def read(self, amt=None):
+        return self._response.read(amt)
 
-    def __init__(self, *args, **kwargs):
-        super(method_result, self).__init__()
-        self._fetched = False
-        aggressive = kwargs.get("aggressive")
+    def close(self):
+        conn, self._conn = self._conn, None
 
-        if "aggressive" in kwargs:
-            del kwargs["aggressive"]
+        if not conn:
+            return
 
-        self._downloader = http_downloader(*args, **kwargs)
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool._release(self._origin, conn)
+        else:
+            self._response.close()
+            conn.close()
 
-        if aggressive:
-            self.call()
 
-    def __getitem__(self, *args, **kwargs):
-        return self.__handle_accessor("__getitem__", *args, **kwargs)
+class _content_decoder(object):
+    """ Incrementally decodes a gzip or deflate encoded body while counting
+    the bytes before and after decompression """
 
-    def __setitem__(self, *args, **kwargs):
-        return self.__handle_accessor("__setitem__", *args, **kwargs)
+    def __init__(self, encoding):
+        encoding = (encoding or '').strip().lower()
+        self._raw_fallback = False
+        self._obj = None
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
 
-    def __delitem__(self, *args, **kwargs):
-        return self.__handle_accessor("__delitem__", *args, **kwargs)
+        if encoding in ("gzip", "x-gzip"):
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._obj = zlib.decompressobj()
+            # Plenty of servers send raw deflate streams without the zlib header
+            self._raw_fallback = True
+
+    def decode(self, chunk):
+        self.wire_bytes += len(chunk)
+
+        if self._obj:
+            try:
+                chunk = self._obj.decompress(chunk)
+            except zlib.error:
+                if not self._raw_fallback:
+                    raise
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+                chunk = self._obj.decompress(chunk)
+            self._raw_fallback = False
+
+        self.decoded_bytes += len(chunk)
+        return chunk
+
+    def flush(self):
+        chunk = b''
+
+        if self._obj:
+            chunk = self._obj.flush()
+
+        self.decoded_bytes += len(chunk)
+        return chunk
+
+
+class http_pool(object):
+    """ Connection pool shared by every downloader, replace it with
+    one created with different limits if the defaults don't fit """
+    __pool = None
+    __lock = threading.Lock()
+
+    @classmethod
+    def set(cls, pool):
+        old, cls.__pool = cls.__pool, pool
+
+        if old and old is not pool:
+            old.clear()
+
+    @classmethod
+    def get(cls):
+        if not cls.__pool:
+            with cls.__lock:
+                if not cls.__pool:
+                    cls.__pool = connection_pool()
+
+        return cls.__pool
+
+
+class json_stream(object):
+    """ Extracts the elements of the array found under the keys in 'path'
+    from a JSON document that arrives as an iterable of byte chunks, yielding
+    each element as soon as it's complete. Only one element (or one value
+    off the path) is held at a time, so memory use doesn't grow with the
+    size of the array. Everything off the path is collected into 'rest'
+    which, once the stream is exhausted, is the whole document minus the
+    elements of the array. """
+
+    _whitespace = " \t\n\r"
+    _number_chars = "0123456789.eE+-"
+
+    def __init__(self, chunks, path):
+        self._chunks = iter(chunks)
+        self._path = list(path)
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.rest = None
+
+    def _fill(self):
+        """ Appends the next chunk to the buffer, returns False at the end """
+        if self._eof:
+            return False
+
+        chunk = next(self._chunks, None)
+
+        if chunk is None:
+            self._eof = True
+            text = self._text.decode(b'', True)
+        else:
+            text = self._text.decode(chunk)
+
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+
+        return True
+
+    def _peek(self):
+        """ Returns the next non-whitespace character without consuming it """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in self._whitespace:
+                self._pos += 1
+
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def _next(self):
+        c = self._peek()
+        self._pos += 1
+        return c
+
+    def _value(self):
+        self._peek()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if self._fill():
+                    continue
+                raise
+
+            # A number cut off by the end of the buffer parses as a shorter
+            # one, so make sure something that can't be part of it follows
+            if (end == len(self._buf) or self._buf[end] in self._number_chars) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def _elements(self):
+        self._next()
+
+        if self._peek() == ']':
+            self._next()
+            return
+
+        while True:
+            yield self._value()
+
+            c = self._next()
+            if c == ']':
+                return
+            elif c != ',':
+                raise ValueError("Expected ',' or ']' in array, got " + repr(c))
+
+    def _object(self, path, rest):
+        self._next()
+
+        if self._peek() == '}':
+            self._next()
+            return
+
+        while True:
+            key = self._value()
+            if self._next() != ':':
+                raise ValueError("Expected ':' after object key")
+
+            if key == path[0]:
+                for element in self._walk(path[1:], rest, key):
+                    yield element
+            else:
+                rest[key] = self._value()
+
+            c = self._next()
+            if c == '}':
+                return
+            elif c != ',':
+                raise ValueError("Expected ',' or '}' in object, got " + repr(c))
+
+    def _walk(self, path, parent, key):
+        """ Walks the value at the current position and stores what's left
+        of it in parent[key] """
+        c = self._peek()
+
+        if not path and c == '[':
+            parent[key] = []
+            return self._elements()
+        elif path and c == '{':
+            parent[key] = {}
+            return self._object(path, parent[key])
+        else:
+            parent[key] = self._value()
+            return iter(())
 
     def __iter__(self):
-        return self.__handle_accessor("__iter__")
+        root = {}
 
-    def __contains__(self, *args, **kwargs):
-        return self.__handle_accessor("__contains__", *args, **kwargs)
+        for element in self._walk(self._path, root, None):
+            yield element
+
+        self.rest = root[None]
+
+
+class _flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _single_flight(object):
+    """ Lets concurrent calls with the same key share one execution. The
+    first caller runs the function, anyone arriving while it's still running
+    waits for and receives the same result or exception. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func, timeout=None):
+        """ Followers give up waiting with DeadlineExceededError after
+        'timeout' seconds, if given """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _flight()
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise DeadlineExceededError("Deadline exceeded waiting for a shared download")
+            if flight.error:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func()
+        except Exception as E:
+            flight.error = E
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.result
 
     def __len__(self):
-        return self.__handle_accessor("__len__")
+        return len(self._flights)
+
+
+class retry_policy(object):
+    """ Retries calls that failed with transient errors. Up to 'max_attempts'
+    attempts are made in total, sleeping a random amount between 0 and
+    'backoff' * 2 ** retry seconds (capped at 'max_backoff') in between so
+    that clients that failed together don't retry together. 'deadline' caps
+    the total seconds spent, including sleeps. Which exceptions are worth
+    retrying is decided by 'retry_on', or by overriding should_retry. """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30, deadline=None,
+                 retry_on=(HTTPTimeoutError, HTTPInternalServerError, HTTPTooManyRequestsError)):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(("calls", "retries", "gave_up"), 0)
+
+    def should_retry(self, error, attempt):
+        """ Whether to retry after the given exception on the given
+        attempt (starting at 1) """
+        return isinstance(error, self.retry_on) and not isinstance(error, DeadlineExceededError)
+
+    def delay(self, error, attempt):
+        """ Seconds to sleep before the next attempt """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        retry_after = getattr(error, "retry_after", None)
+
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        return delay
+
+    def _next_delay(self, error, attempt, start, expires=None):
+        """ Returns the delay before retrying, None when it's time to give up.
+        'expires' is when the caller's deadline runs out, if it has one. """
+        if attempt >= self.max_attempts or not self.should_retry(error, attempt):
+            return None
+
+        delay = self.delay(error, attempt)
+
+        if self.deadline is not None and time.time() + delay - start >= self.deadline:
+            return None
+
+        if expires is not None and time.time() + delay >= expires:
+            return None
+
+        return delay
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def run(self, func, *args, **kwargs):
+        """ Calls func until it succeeds or the policy gives up, in which case
+        the last exception is raised """
+        return self._run(deadline.expires(), func, args, kwargs)
+
+    def _run(self, expires, func, args, kwargs):
+        start = time.time()
+        attempt = 0
+        self._count("calls")
+
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as E:
+                delay = self._next_delay(E, attempt, start, expires)
+                if delay is None:
+                    if attempt > 1:
+                        self._count("gave_up")
+                    raise
+            self._count("retries")
+            time.sleep(delay)
+
+    async def async_run(self, func, *args, **kwargs):
+        """ Same as run for coroutine functions """
+        return await self._async_run(deadline.expires(), func, args, kwargs)
+
+    async def _async_run(self, expires, func, args, kwargs):
+        import asyncio
+
+        start = time.time()
+        attempt = 0
+        self._count("calls")
+
+        while True:
+            attempt += 1
+            try:
+                return await func(*args, **kwargs)
+            except Exception as E:
+                delay = self._next_delay(E, attempt, start, expires)
+                if delay is None:
+                    if attempt > 1:
+                        self._count("gave_up")
+                    raise
+            self._count("retries")
+            await asyncio.sleep(delay)
 
-    def __str__(self):
-        return self.__handle_accessor("__str__")
+    @property
+    def stats(self):
+        """ Calls made through the policy, retries done and calls that
+        failed even after retrying """
+        with self._lock:
+            return dict(self._stats)
 
-    def call(self):
-        """ Make the API call again and fetch fresh data. """
-        data = self._downloader.download()
 
-        # Only try to pass errors arg if supported
-        if sys.version >= "2.7":
-            data = data.decode("utf-8", errors="ignore")
+class retries(object):
+    """ Retry policy applied to every download, none by default """
+    __policy = None
+
+    @classmethod
+    def set(cls, value):
+        cls.__policy = value
+
+    @classmethod
+    def get(cls):
+        return cls.__policy
+
+
+class request_coalescing(object):
+    """ Whether concurrent identical downloads (same URL, POST data and
+    conditional headers) share one request. On by default. """
+    __enabled = True
+    _flights = _single_flight()
+
+    @classmethod
+    def set(cls, value):
+        cls.__enabled = bool(value)
+
+    @classmethod
+    def get(cls):
+        return cls.__enabled
+
+
+def _parse_retry_after(value):
+    """ Retry-After is either a number of seconds or an HTTP date """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        date = parsedate_tz(value)
+        if date:
+            return max(0.0, mktime_tz(date) - time.time())
+
+
+class _bucket(object):
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.paused_until = 0
+        self.strikes = 0
+
+
+class token_bucket_limiter(object):
+    """ Client side rate limiter with a token bucket per host and API key.
+    Each bucket allows 'rate' requests per second with bursts of up to
+    'burst' requests. When the server throttles a bucket anyway it stops
+    for as long as Retry-After says (or backs off exponentially from
+    'backoff' seconds up to 'max_backoff' if it didn't say) and its rate is
+    halved, down to 'min_rate'. Every successful request after that wins
+    back 'recovery' times the configured rate. """
+
+    def __init__(self, rate=10, burst=10, min_rate=0.1, recovery=0.05,
+                 backoff=1, max_backoff=300):
+        self._rate = float(rate)
+        self._burst = burst
+        self._min_rate = min_rate
+        self._recovery = recovery
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(("requests", "waits", "wait_time", "throttled", "queue_depth"), 0)
+
+    def _get_bucket(self, bucket):
+        b = self._buckets.get(bucket)
+
+        if not b:
+            b = self._buckets[bucket] = _bucket(self._rate, self._burst)
+
+        return b
+
+    def reserve(self, host, apikey=None):
+        """ Takes a token from the bucket and returns how many seconds to wait
+        before using it. Waiting is left to the caller, see acquire. """
+        now = time.time()
+
+        with self._lock:
+            b = self._get_bucket((host, apikey))
+            b.tokens = min(self._burst, b.tokens + max(0, now - b.updated) * b.rate) - 1
+            b.updated = max(now, b.updated)
+            delay = max(-b.tokens / b.rate, b.paused_until - now, 0)
+
+            self._stats["requests"] += 1
+            if delay > 0:
+                self._stats["waits"] += 1
+                self._stats["wait_time"] += delay
+
+        return delay
+
+    def acquire(self, host, apikey=None):
+        """ Blocks until a request to host may be sent """
+        delay = self.reserve(host, apikey)
+
+        if delay > 0:
+            with self._lock:
+                self._stats["queue_depth"] += 1
+            try:
+                time.sleep(delay)
+            finally:
+                with self._lock:
+                    self._stats["queue_depth"] -= 1
+
+    async def async_acquire(self, host, apikey=None):
+        import asyncio
+
+        delay = self.reserve(host, apikey)
+
+        if delay > 0:
+            with self._lock:
+                self._stats["queue_depth"] += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                with self._lock:
+                    self._stats["queue_depth"] -= 1
+
+    def throttled(self, host, apikey=None, retry_after=None):
+        """ Called when the server answered with a 429 """
+        now = time.time()
+
+        with self._lock:
+            b = self._get_bucket((host, apikey))
+            if retry_after is None:
+                retry_after = min(self._max_backoff, self._backoff * 2 ** b.strikes)
+            b.strikes += 1
+            b.paused_until = max(b.paused_until, now + retry_after)
+            b.rate = max(self._min_rate, b.rate / 2)
+            self._stats["throttled"] += 1
+
+    def succeeded(self, host, apikey=None):
+        with self._lock:
+            b = self._get_bucket((host, apikey))
+            b.strikes = 0
+            b.rate = min(self._rate, b.rate + self._rate * self._recovery)
+
+    def rate(self, host, apikey=None):
+        """ Current requests per second allowed for the bucket """
+        with self._lock:
+            return self._get_bucket((host, apikey)).rate
+
+    @property
+    def queue_depth(self):
+        """ Number of callers currently waiting for a token """
+        return self._stats["queue_depth"]
+
+    @property
+    def stats(self):
+        """ Totals of requests, requests that had to wait, seconds waited and
+        429s seen, along with the current queue depth """
+        with self._lock:
+            return dict(self._stats)
+
+
+class rate_limiter(object):
+    """ Limiter every download goes through, disabled by default.
+    Set it to a token_bucket_limiter to enable it. """
+    __limiter = None
+
+    @classmethod
+    def set(cls, value):
+        cls.__limiter = value
+
+    @classmethod
+    def get(cls):
+        return cls.__limiter
+
+
+class hooks(object):
+    """ Callables notified of what the API layer is doing. Each hook is
+    called as hook(event, details) where event is "request_start",
+    "request_end", "decode" or "circuit_state" and details is a dict
+    describing the request (or circuit_breaker state change).
+    Exceptions raised by hooks are not caught, except for circuit_state
+    events of a failed request, where they'd hide the request's error. """
+    __hooks = ()
+    __lock = threading.Lock()
+
+    @classmethod
+    def register(cls, hook):
+        with cls.__lock:
+            if hook not in cls.__hooks:
+                cls.__hooks = cls.__hooks + (hook,)
+
+    @classmethod
+    def unregister(cls, hook):
+        with cls.__lock:
+            cls.__hooks = tuple(h for h in cls.__hooks if h != hook)
+
+    @classmethod
+    def active(cls):
+        """ True if any hooks are registered, so callers can skip building
+        events nobody will see """
+        return bool(cls.__hooks)
+
+    @classmethod
+    def emit(cls, event, details):
+        for hook in cls.__hooks:
+            hook(event, details)
+
+
+def _push(var, value):
+    """ Context variables hold a stack of (value, rest) so that the same
+    context manager can be entered by several threads or tasks at once """
+    var.set((value, var.get()))
+
+
+def _pop(var):
+    var.set(var.get()[1])
+
+
+def _top(var):
+    stack = var.get()
+    return stack[0] if stack else None
+
+
+class tagged(object):
+    """ Names the requests created inside it in hook events, for example
+    'with tagged("items.schema"):'. Tags are per thread or asyncio task, and
+    the innermost one wins. """
+    _stack = ContextVar("steamodd_tag", default=None)
+
+    def __init__(self, name):
+        self._name = name
+
+    def __enter__(self):
+        _push(tagged._stack, self._name)
+        return self
+
+    def __exit__(self, *exc):
+        _pop(tagged._stack)
+
+    @classmethod
+    def current(cls):
+        return _top(cls._stack)
+
+
+def _endpoint(url):
+    """ Returns the (interface, method, version) of a Web API URL,
+    or Nones for anything else """
+    path = urlsplit(url).path.strip('/').split('/')
+
+    if len(path) == 3 and path[2][:1] == 'v' and path[2][1:].isdigit():
+        return path[0], path[1], int(path[2][1:])
+
+    return None, None, None
+
+
+class _circuit(object):
+    def __init__(self):
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self.probes = 0
+
+
+class circuit_breaker(object):
+    """ Fails requests fast with CircuitOpenError while an endpoint (Web API
+    interface and method, or host for other URLs) is down instead of letting
+    each one wait for its timeout. 'failure_threshold' consecutive timeouts
+    or 5xx responses open the circuit. After 'reset_timeout' seconds it goes
+    half-open and lets up to 'half_open_max' trial requests through, closing
+    again if they succeed and reopening if they don't. State changes are
+    emitted to hooks as "circuit_state" events. """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, half_open_max=1,
+                 trip_on=(HTTPTimeoutError, HTTPInternalServerError)):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.trip_on = trip_on
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def should_trip(self, error, status=None):
+        """ Whether the given exception counts as the endpoint failing.
+        Errors the server answered with on purpose, like 404s, don't. """
+        return isinstance(error, self.trip_on) or (status or 0) >= 500
+
+    def _transition(self, name, circuit, state):
+        """ Changes state, returns the event to emit once the lock is released """
+        previous, circuit.state = circuit.state, state
+
+        return {"circuit": name, "state": state, "previous": previous, "failures": circuit.failures}
+
+    def _emit(self, event):
+        if event:
+            hooks.emit("circuit_state", event)
+
+    def before(self, name):
+        """ Called before a request to the named endpoint, raises
+        CircuitOpenError if it may not be sent """
+        now = time.time()
+        event = None
+
+        with self._lock:
+            circuit = self._circuits.get(name)
+            if not circuit:
+                circuit = self._circuits[name] = _circuit()
+
+            if circuit.state == "open":
+                remaining = circuit.opened + self.reset_timeout - now
+                if remaining > 0:
+                    raise CircuitOpenError("Circuit open for {0}".format(name), remaining)
+                event = self._transition(name, circuit, "half_open")
+
+            if circuit.state == "half_open":
+                if circuit.probes >= self.half_open_max:
+                    raise CircuitOpenError("Circuit half-open for {0}".format(name), 0)
+                circuit.probes += 1
+
+        try:
+            self._emit(event)
+        except BaseException:
+            # The request won't be sent, its trial slot has to go back
+            self.release(name)
+            raise
+
+    def settle(self, name, error=None, status=None):
+        """ Called once a request that got past before is done, with the
+        exception it raised if any. Requests that ran out of their deadline
+        or were interrupted (cancelled tasks, KeyboardInterrupt) say nothing
+        about the endpoint, they only give back their trial slot. """
+        if error is None:
+            self.succeeded(name)
+        elif not isinstance(error, Exception) or isinstance(error, DeadlineExceededError):
+            self.release(name)
+        elif self.should_trip(error, status):
+            self.failed(name)
         else:
-            data = data.decode("utf-8")
+            self.succeeded(name)
+
+    def release(self, name):
+        """ Gives back a trial request slot without changing the state """
+        with self._lock:
+            circuit = self._circuits.get(name)
+            if circuit and circuit.state == "half_open" and circuit.probes > 0:
+                circuit.probes -= 1
+
+    def succeeded(self, name):
+        """ Called when a request answered, closes half-open circuits """
+        event = None
+
+        with self._lock:
+            circuit = self._circuits.get(name)
+            if not circuit:
+                # Reset while the request was in flight
+                return
+            circuit.failures = 0
+            if circuit.state == "half_open":
+                circuit.probes = 0
+                event = self._transition(name, circuit, "closed")
+
+        self._emit(event)
+
+    def failed(self, name):
+        """ Called when a request failed, opens the circuit once there have
+        been enough failures in a row or a trial request failed """
+        event = None
+
+        with self._lock:
+            circuit = self._circuits.get(name)
+            if not circuit:
+                return
+            circuit.failures += 1
+            if (circuit.state == "half_open" or
+                    (circuit.state == "closed" and circuit.failures >= self.failure_threshold)):
+                circuit.probes = 0
+                circuit.opened = time.time()
+                event = self._transition(name, circuit, "open")
+
+        self._emit(event)
+
+    def _state(self, circuit):
+        if circuit.state == "open" and time.time() >= circuit.opened + self.reset_timeout:
+            return "half_open"
+
+        return circuit.state
+
+    def state(self, name):
+        """ "closed", "open" or "half_open" """
+        with self._lock:
+            circuit = self._circuits.get(name)
+            return self._state(circuit) if circuit else "closed"
+
+    def reset(self, name=None):
+        """ Closes the named circuit, or all of them """
+        with self._lock:
+            if name is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(name, None)
 
-        self.update(json.loads(data))
-        self._fetched = True
+    @property
+    def stats(self):
+        """ State and consecutive failures of every endpoint seen """
+        with self._lock:
+            return dict((name, {"state": self._state(circuit), "failures": circuit.failures})
+                        for name, circuit in self._circuits.items())
 
-    def get(self, *args, **kwargs):
-        return self.__handle_accessor("get", *args, **kwargs)
 
-    def keys(self):
-        return self.__handle_accessor("keys")
+class circuit_breakers(object):
+    """ Breaker every download goes through, disabled by default.
+    Set it to a circuit_breaker to enable it. """
+    __breaker = None
+
+    @classmethod
+    def set(cls, value):
+        cls.__breaker = value
+
+    @classmethod
+    def get(cls):
+        return cls.__breaker
+
+
+class response_cache(object):
+    """ Response store consulted by every downloader, disabled by default.
+    Set it to one of the backends in steam.cache to have responses stored,
+    served while fresh and revalidated with conditional requests after. """
+    __cache = None
+
+    @classmethod
+    def set(cls, value):
+        cls.__cache = value
+
+    @classmethod
+    def get(cls):
+        return cls.__cache
+
+
+class revalidating(object):
+    """ Makes downloads in this thread (or asyncio task) revalidate cached
+    responses even while they're fresh, so that they're conditional requests
+    instead of cache hits. 'store' is used in place of response_cache if given. """
+    _stack = ContextVar("steamodd_revalidating", default=None)
+
+    def __init__(self, store=None):
+        self._store = store
+
+    def __enter__(self):
+        _push(revalidating._stack, self._store)
+        return self
+
+    def __exit__(self, *exc):
+        _pop(revalidating._stack)
+
+    @classmethod
+    def active(cls):
+        return cls._stack.get() is not None
+
+    @classmethod
+    def store(cls):
+        return _top(cls._stack)
+
+
+class deadline(object):
+    """ Time budget in seconds shared by every request created inside it,
+    for example 'with deadline(10):'. Each request's timeout is cut down to
+    what's left, and once it's gone requests raise DeadlineExceededError
+    instead of being sent. The budget starts when the deadline is created,
+    so one can be entered again and again to spread it over several steps.
+    Nested deadlines can only shorten it. None means no deadline. It applies
+    to the thread or asyncio task that entered it. """
+    _stack = ContextVar("steamodd_deadline", default=None)
+
+    def __init__(self, seconds=None):
+        self._expires = None if seconds is None else time.time() + seconds
+
+    def __enter__(self):
+        _push(deadline._stack, _earliest(deadline.expires(), self._expires))
+        return self
+
+    def __exit__(self, *exc):
+        _pop(deadline._stack)
+
+    @classmethod
+    def expires(cls):
+        """ When the current deadline runs out as a timestamp, None if there isn't one """
+        return _top(cls._stack)
+
+    @classmethod
+    def remaining(cls):
+        """ Seconds left of the current deadline, None if there isn't one """
+        expires = cls.expires()
+
+        if expires is not None:
+            return max(0.0, expires - time.time())
+
+
+def _earliest(*times):
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+
+class _buffered_response(object):
+    """ Response served from memory. If bytes_per_second is given reads
+    are slowed down to that rate. """
+
+    def __init__(self, status, reason, headers, body, bytes_per_second=None):
+        self.status = status
+        self.reason = reason
+        self.headers = httplib.HTTPMessage()
+        self._body = io.BytesIO(body)
+        self._bytes_per_second = bytes_per_second
+
+        for k, v in headers:
+            self.headers[k] = v
+
+    def read(self, amt=None):
+        data = self._body.read(amt)
+
+        if self._bytes_per_second and data:
+            time.sleep(len(data) / float(self._bytes_per_second))
+
+        return data
+
+    def close(self):
+        pass
+
+
+class urllib_transport(transport):
+    """ Sends every request through a fresh urlopen call, no connection
+    reuse. Mostly useful as a baseline to compare the pool against. """
+
+    def request(self, url, headers={}, data=None, timeout=None):
+        try:
+            return _urllib_response(urlopen(urlrequest(url, headers=headers, data=data), timeout=timeout))
+        except urlerror.HTTPError as E:
+            # Error statuses are ordinary responses as far as transports go
+            return _urllib_response(E)
+
+
+class _urllib_response(object):
+    def __init__(self, res):
+        self._res = res
+        self.status = res.getcode()
+        self.reason = getattr(res, "reason", '')
+        self.headers = res.headers
+
+    def read(self, amt=None):
+        return self._res.read(amt)
+
+    def close(self):
+        self._res.close()
+
+
+def _recording_name(path, key):
+    return os.path.join(path, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+
+def _write_recording(path, key, status, reason, headers, body):
+    meta = {"key": key, "status": status, "reason": reason, "headers": headers}
+    fd, tmpname = tempfile.mkstemp(dir=path, prefix=".tmp")
+
+    with os.fdopen(fd, "wb") as recording:
+        recording.write(json.dumps(meta).encode("utf-8") + b"\n")
+        recording.write(body)
+
+    os.replace(tmpname, _recording_name(path, key))
+
+
+class recording_transport(transport):
+    """ Passes requests on to another transport (the shared pool by
+    default) and saves every response to 'path' so that replay_transport
+    can serve it later. Bodies are saved as they came over the wire. """
+
+    def __init__(self, path, transport=None):
+        self._path = path
+        self._transport = transport
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def request(self, url, headers={}, data=None, timeout=None):
+        res = (self._transport or http_pool.get()).request(url, headers=headers, data=data,
+                                                           timeout=timeout)
+        try:
+            body = res.read()
+        finally:
+            res.close()
+
+        headers = list(res.headers.items())
+        _write_recording(self._path, replay_transport.key(url, data),
+                         res.status, res.reason, headers, body)
+
+        return _buffered_response(res.status, res.reason, headers, body)
+
+
+class replay_transport(transport):
+    """ Serves responses saved by recording_transport (or added with 'add')
+    from 'path' without any network access. 'latency' is the number of
+    seconds to wait before each response (or a function returning it) and
+    'bytes_per_second' slows down reading bodies, to simulate a real
+    connection. Requests without a recording raise ReplayMissError.
+    API keys aren't part of what's matched. """
+
+    def __init__(self, path, latency=0, bytes_per_second=None):
+        self._path = path
+        self._latency = latency
+        self._bytes_per_second = bytes_per_second
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    @staticmethod
+    def key(url, data=None):
+        if data and not isinstance(data, dict):
+            data = dict(parse_qsl(data.decode("utf-8")))
+
+        return cache.canonical_key(url, data)
+
+    def add(self, url, body, status=200, headers={}, data=None, reason="OK"):
+        """ Saves a response to be served for the given URL and POST data """
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+
+        _write_recording(self._path, self.key(url, data), status, reason,
+                         list(headers.items()), body)
+
+    def request(self, url, headers={}, data=None, timeout=None):
+        key = self.key(url, data)
+
+        try:
+            with open(_recording_name(self._path, key), "rb") as recording:
+                meta = json.loads(recording.readline().decode("utf-8"))
+                body = recording.read()
+        except (IOError, OSError):
+            raise ReplayMissError("No recorded response for " + key)
+
+        latency = self._latency() if callable(self._latency) else self._latency
+
+        if latency:
+            time.sleep(latency)
+
+        return _buffered_response(meta["status"], meta["reason"], meta["headers"], body,
+                                  self._bytes_per_second)
+
+
+class http_transport(object):
+    """ Transport every download goes through, the shared connection pool
+    (see http_pool) unless set to something else """
+    __transport = None
+
+    @classmethod
+    def set(cls, value):
+        cls.__transport = value
+
+    @classmethod
+    def get(cls):
+        return cls.__transport or http_pool.get()
+
+
+class _interface_method(object):
+    def __init__(self, iface, name):
+        self._iface = iface
+        self._name = name
+
+    def _build_url(self, version, kwargs):
+        kwargs.setdefault("format", "json")
+
+        if "key" not in kwargs:
+            pool = key_pool.get()
+            kwargs["key"] = pool.peek() if pool else key.get()
+
+        return "https://api.steampowered.com/{0}/{1}/v{2}?{3}".format(self._iface,
+                                                                     self._name,
+                                                                     version,
+                                                                     urlencode(kwargs))
+
+    def __call__(self, version=1, timeout=None, since=None,
+                 aggressive=False, data={}, etag=None, **kwargs):
+        url = self._build_url(version, kwargs)
+
+        return method_result(url, last_modified=since, timeout=timeout, aggressive=aggressive, data=data,
+                             etag=etag)
+
+
+class interface(object):
+    def __init__(self, iface):
+        self._iface = iface
+
+    def __getattr__(self, name):
+        return _interface_method(self._iface, name)
+
+
+class http_downloader(object):
+    _chunk_size = 65536
+    # What survives pickling, the rest describes the request in progress
+    _pickled = ("_url", "_timeout", "_last_modified", "_etag", "_data",
+                "_wire_bytes", "_decoded_bytes", "_tag")
+
+    def __init__(self, url, last_modified=None, timeout=None, data={}, etag=None):
+        self._user_agent = "Mozilla/5.0 (Windows; U; Windows NT 6.1; en-US; Valve Steam Client/1366845241; ) AppleWebKit/535.15 (KHTML, like Gecko) Chrome/18.0.989.0 Safari/535.11"
+        self._url = url
+        self._endpoint = _endpoint(url)
+        self._timeout = timeout or socket_timeout.get()
+        self._last_modified = last_modified
+        self._etag = etag
+        self._data = None
+        self._wire_bytes = 0
+        self._decoded_bytes = 0
+        self._tag = tagged.current()
+        self._deadline = deadline.expires()
+        self._status = None
+        self._cache_outcome = None
+        self._ttfb = None
+        self._download_time = None
+
+        if data:
+            self._data = data
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self._pickled)
+
+    def __setstate__(self, state):
+        http_downloader.__init__(self, state[0])
+        for name, value in zip(self._pickled, state):
+            setattr(self, name, value)
+
+    def _build_headers(self, cached=None):
+        head = {"Accept-Encoding": "gzip, deflate"}
+
+        if self._last_modified or self._etag:
+            if self._last_modified:
+                head["If-Modified-Since"] = str(self._last_modified)
+            if self._etag:
+                head["If-None-Match"] = str(self._etag)
+        elif cached:
+            if cached.last_modified:
+                head["If-Modified-Since"] = str(cached.last_modified)
+            if cached.etag:
+                head["If-None-Match"] = str(cached.etag)
+
+        if self._user_agent:
+            head["User-Agent"] = str(self._user_agent)
+
+        return head
+
+    def _raise_for_status(self, code, reason, headers=None):
+        self._status = code
+
+        if code == 404:
+            raise HTTPFileNotFoundError("File not found")
+        elif code in (401, 403):
+            raise HTTPForbiddenError("Server connection failed: {0} ({1})".format(reason, code))
+        elif code == 429:
+            retry_after = _parse_retry_after((headers or {}).get("retry-after"))
+            raise HTTPTooManyRequestsError("Too many requests", retry_after)
+        elif code == 304:
+            raise HTTPStale(str(self._last_modified or self._etag))
+        elif code == 500:
+            raise HTTPInternalServerError("Internal Server Error")
+        else:
+            raise HTTPError("Server connection failed: {0} ({1})".format(reason, code))
+
+    def _build_body(self):
+        if self._data:
+            return urlencode(self._data).encode("utf-8")
+
+    def _handle_response(self, status_code, reason, headers):
+        self._status = status_code
+
+        if not 200 <= status_code < 300:
+            self._raise_for_status(status_code, reason, headers)
+
+        lm = headers.get("last-modified")
+        self._last_modified = lm
+        self._etag = headers.get("etag")
+
+    def _cache_lookup(self):
+        """ Returns the (store, key, entry) to revalidate against. The cache
+        stays out of the way if the caller asked for a conditional request
+        themselves, since they want to see HTTPStale then. """
+        store = revalidating.store()
+
+        if store is None:
+            store = response_cache.get()
+
+        if store is None:
+            return None, None, None
+
+        key = cache.canonical_key(self._url, self._data)
+
+        if self._last_modified or self._etag:
+            return store, key, None
+
+        return store, key, store.get(key)
+
+    def _cache_fresh(self, store, cached):
+        if revalidating.active():
+            return False
+
+        return cached and cached.age < store.ttl(*self._endpoint[:2])
+
+    def _cache_store(self, store, key, body, headers):
+        if store is not None:
+            self._cache_outcome = "miss"
+            store.count("misses")
+            store.set(key, cache.entry(body, self._last_modified, self._etag))
+
+    def _cache_hit(self, store, key, cached, revalidated=False):
+        """ Called for entries that are fresh or the server says are still good """
+        if revalidated:
+            self._cache_outcome = "revalidated"
+            store.count("revalidations")
+            store.set(key, cache.entry(cached.body, cached.last_modified, cached.etag))
+        else:
+            self._cache_outcome = "hit"
+            store.count("hits")
+
+        self._last_modified = cached.last_modified
+        self._etag = cached.etag
+        self._wire_bytes = 0
+        self._decoded_bytes = len(cached.body)
+
+        return cached.body
+
+    def download(self):
+        if not request_coalescing.get():
+            return self._retried_download()
+
+        flight_key = "{0} {1} {2}".format(cache.canonical_key(self._url, self._data, exclude=()),
+                                          self._last_modified, self._etag)
+
+        def shared_download():
+            body = self._retried_download()
+            return body, self._last_modified, self._etag, self._wire_bytes, self._decoded_bytes
+
+        # Followers keep to their own deadline rather than the leader's
+        expires = self._expires()
+        timeout = None if expires is None else max(0, expires - time.time())
+
+        body, self._last_modified, self._etag, self._wire_bytes, self._decoded_bytes = \
+            request_coalescing._flights.do(flight_key, shared_download, timeout)
+
+        return body
+
+    def _retried_download(self):
+        policy = retries.get()
+
+        if policy:
+            # The deadline this downloader was created under counts too
+            return policy._run(self._expires(), self._download, (), {})
+
+        return self._download()
+
+    def _event(self, **details):
+        """ Returns the details passed to hooks for this request. The URL is
+        given without the API key so events are safe to log. """
+        iface, method, version = self._endpoint
+        details.update(url=cache.canonical_key(self._url), interface=iface,
+                       method=method, version=version, tag=self._tag)
+        return details
+
+    def _request_started(self):
+        self._status = self._cache_outcome = self._ttfb = self._download_time = None
+        self._wire_bytes = self._decoded_bytes = 0
+        hooks.emit("request_start", self._event())
+
+        return time.time()
+
+    def _request_ended(self, started, error=None):
+        hooks.emit("request_end", self._event(status=self._status,
+                                              error=error.__class__.__name__ if error else None,
+                                              cache=self._cache_outcome,
+                                              wire_bytes=self._wire_bytes,
+                                              decoded_bytes=self._decoded_bytes,
+                                              ttfb=self._ttfb,
+                                              download_time=self._download_time,
+                                              duration=time.time() - started))
+
+    def _download(self):
+        if not hooks.active():
+            return self._cached_download()
+
+        started = self._request_started()
+        error = None
+
+        try:
+            return self._cached_download()
+        except Exception as E:
+            error = E
+            raise
+        finally:
+            self._request_ended(started, error)
+
+    def _cached_download(self):
+        store, key, cached = self._cache_lookup()
+
+        if self._cache_fresh(store, cached):
+            return self._cache_hit(store, key, cached)
+
+        try:
+            body, headers = self._guarded_fetch(self._build_headers(cached))
+        except HTTPStale:
+            if not cached:
+                raise
+            return self._cache_hit(store, key, cached, revalidated=True)
+
+        self._cache_store(store, key, body, headers)
+
+        return body
+
+    def _circuit_name(self):
+        iface, method = self._endpoint[:2]
+
+        if iface:
+            return "{0}/{1}".format(iface, method)
+
+        return urlsplit(self._url).hostname
+
+    def _settle(self, breaker, name, error):
+        """ Settles a failed request, a hook failing on the state change
+        mustn't hide why the request itself failed """
+        try:
+            breaker.settle(name, error, self._status)
+        except Exception:
+            pass
+
+    def _guarded_fetch(self, head, fetch=None):
+        """ Goes through the circuit breaker if there is one """
+        breaker = circuit_breakers.get()
+
+        if not breaker:
+            return self._keyed_fetch(head, fetch)
+
+        name = self._circuit_name()
+        breaker.before(name)
+        self._status = None
+
+        try:
+            res = self._keyed_fetch(head, fetch)
+        except BaseException as E:
+            self._settle(breaker, name, E)
+            raise
+
+        breaker.settle(name)
+
+        return res
+
+    def _rate_bucket(self):
+        parts = urlsplit(self._url)
+        return parts.hostname, dict(parse_qsl(parts.query)).get("key")
+
+    def _is_pooled(self, pool):
+        """ Whether the request's API key came from the pool """
+        apikey = dict(parse_qsl(urlsplit(self._url).query)).get("key")
+
+        return apikey is not None and apikey in pool
+
+    def _pooled_key(self, pool):
+        """ Picks the key to send the request with now that it's about to
+        go out, which counts the call, and puts it in the URL. Returns None
+        if no key in the pool is usable. """
+        try:
+            apikey = pool.acquire()
+        except APIKeyMissingError:
+            return None
+
+        parts = urlsplit(self._url)
+        query = [(k, apikey if k == "key" else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+        self._url = urlunsplit(parts[:3] + (urlencode(query), parts[4]))
+
+        return apikey
+
+    def _keyed_fetch(self, head, fetch=None):
+        """ Sends requests with pooled API keys with the key to use right
+        now, reporting how they went and retrying refused ones with other
+        keys while there are any """
+        pool = key_pool.get()
+
+        if not pool or not self._is_pooled(pool):
+            return self._limited_fetch(head, fetch)
+
+        apikey = self._pooled_key(pool)
+        if not apikey:
+            raise APIKeyMissingError("No API key in the pool is available")
+
+        while True:
+            try:
+                return self._limited_fetch(head, fetch)
+            except HTTPTooManyRequestsError as E:
+                pool.throttled(apikey, E.retry_after)
+                raise
+            except HTTPForbiddenError:
+                pool.revoked(apikey)
+                apikey = self._pooled_key(pool)
+                if not apikey:
+                    raise
+
+    def _limited_fetch(self, head, fetch=None):
+        limiter = rate_limiter.get()
+        fetch = fetch or self._fetch
+
+        if not limiter:
+            return fetch(head)
+
+        bucket = self._rate_bucket()
+        limiter.acquire(*bucket)
+
+        try:
+            res = fetch(head)
+        except HTTPTooManyRequestsError as E:
+            limiter.throttled(bucket[0], bucket[1], E.retry_after)
+            raise
+        except HTTPStale:
+            limiter.succeeded(*bucket)
+            raise
+
+        limiter.succeeded(*bucket)
+
+        return res
+
+    def _expires(self):
+        return _earliest(self._deadline, deadline.expires())
+
+    def _request_timeout(self):
+        """ The socket timeout, cut down to what is left of the deadline """
+        expires = self._expires()
+
+        if expires is None:
+            return self._timeout
+
+        remaining = expires - time.time()
+        if remaining <= 0:
+            raise DeadlineExceededError("Deadline exceeded")
+
+        return min(self._timeout, remaining)
+
+    def _timed_out(self):
+        """ Returns the exception for a timeout, which tells whether it was
+        the deadline that ran out """
+        expires = self._expires()
+
+        if expires is not None and time.time() >= expires:
+            return DeadlineExceededError("Deadline exceeded")
+
+        return HTTPTimeoutError("Server took too long to respond")
+
+    def _open(self, head):
+        """ Sends the request and returns the response once its status is
+        known to be good, leaving the body to be read """
+        timeout = self._request_timeout()
+        started = time.time()
+
+        try:
+            req = http_transport.get().request(self._url, headers=head, data=self._build_body(),
+                                               timeout=timeout)
+        except urlerror.HTTPError as E:
+            self._raise_for_status(E.code, E.reason, E.headers)
+        except (socket.timeout, urlerror.URLError):
+            raise self._timed_out()
+        except (socket.error, httplib.HTTPException) as E:
+            raise HTTPError("Server read error: {0}".format(E))
+
+        self._ttfb = time.time() - started
+
+        if not 200 <= req.status < 300:
+            # Drain error bodies so the connection can be reused
+            try:
+                req.read()
+            except (socket.error, httplib.HTTPException):
+                pass
+            finally:
+                req.close()
+
+        self._handle_response(req.status, req.reason, req.headers)
+
+        return req
+
+    def _iter_body(self, req):
+        decoder = _content_decoder(req.headers.get("content-encoding"))
+        expires = self._expires()
+        started = time.time()
+
+        try:
+            while True:
+                chunk = req.read(self._chunk_size)
+                if not chunk:
+                    break
+                if expires is not None and time.time() >= expires:
+                    raise DeadlineExceededError("Deadline exceeded")
+                yield decoder.decode(chunk)
+
+            yield decoder.flush()
+        except socket.timeout:
+            raise self._timed_out()
+        except (socket.error, httplib.HTTPException, zlib.error) as E:
+            raise HTTPError("Server read error: {0}".format(E))
+        finally:
+            req.close()
+            self._download_time = time.time() - started
+            self._wire_bytes = decoder.wire_bytes
+            self._decoded_bytes = decoder.decoded_bytes
+
+    def _fetch(self, head):
+        req = self._open(head)
+
+        return b''.join(self._iter_body(req)), req.headers
+
+    def iter_content(self):
+        """ Yields the body in chunks as they arrive instead of returning it
+        all at once. Streamed bodies aren't stored in the response cache
+        and aren't shared with concurrent downloads. """
+        if not hooks.active():
+            for chunk in self._iter_content():
+                yield chunk
+            return
+
+        started = self._request_started()
+        error = None
+
+        try:
+            for chunk in self._iter_content():
+                yield chunk
+        except Exception as E:
+            error = E
+            raise
+        finally:
+            self._request_ended(started, error)
+
+    def _iter_content(self):
+        store, key, cached = self._cache_lookup()
+
+        if self._cache_fresh(store, cached):
+            yield self._cache_hit(store, key, cached)
+            return
+
+        head = self._build_headers(cached)
+        policy = retries.get()
+
+        try:
+            if policy:
+                req = policy._run(self._expires(), self._guarded_fetch, (head, self._open), {})
+            else:
+                req = self._guarded_fetch(head, self._open)
+        except HTTPStale:
+            if not cached:
+                raise
+            yield self._cache_hit(store, key, cached, revalidated=True)
+            return
+
+        for chunk in self._iter_body(req):
+            yield chunk
+
+    @property
+    def last_modified(self):
+        return self._last_modified
+
+    @property
+    def etag(self):
+        """ The ETag of the last response, pass it back as etag to get
+        HTTPStale instead of the same body again """
+        return self._etag
+
+    @property
+    def wire_bytes(self):
+        """ Size of the last response body as sent over the network """
+        return self._wire_bytes
+
+    @property
+    def decoded_bytes(self):
+        """ Size of the last response body after decompression """
+        return self._decoded_bytes
+
+    @property
+    def url(self):
+        return self._url
+
+
+class _fetch_lock(object):
+    """ Reentrant lock for objects that fetch or build things lazily, so that
+    threads sharing one wait for a single fetch instead of each doing their
+    own. Copies don't share it, it pickles as a new lock. """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def __reduce__(self):
+        return _fetch_lock, ()
+
+
+class method_result(dict):
+    """ Holds a deserialized JSON object obtained from fetching the given URL.
+    If aggressive is True then the data will be fetched when the method is called
+    instead of only when the object is actually accessed. Results can be
+    shared between threads, the first access fetches and the rest wait for it.
+    """
+
+    _downloader_class = http_downloader
+
+    def __handle_accessor(self, method, *args, **kwargs):
+        try:
+            if not self._fetched:
+                self._fetch()
+        except AttributeError:
+            self._fetched = True
+
+        return getattr(super(method_result, self), method)(*args, **kwargs)
+
+    def __init__(self, *args, **kwargs):
+        super(method_result, self).__init__()
+        self._fetched = False
+        self._lock = _fetch_lock()
+        aggressive = kwargs.get("aggressive")
+
+        if "aggressive" in kwargs:
+            del kwargs["aggressive"]
+
+        self._downloader = self._downloader_class(*args, **kwargs)
+
+        if aggressive:
+            self.call()
+
+    def __reduce__(self):
+        """ Pickles fetched data as is, along with the downloader to fetch
+        it again with. Unfetched results are fetched on access once loaded. """
+        return _restore_result, (self.__class__, dict.copy(self), self._downloader, self._fetched)
+
+    def __getitem__(self, *args, **kwargs):
+        return self.__handle_accessor("__getitem__", *args, **kwargs)
+
+    def __setitem__(self, *args, **kwargs):
+        return self.__handle_accessor("__setitem__", *args, **kwargs)
+
+    def __delitem__(self, *args, **kwargs):
+        return self.__handle_accessor("__delitem__", *args, **kwargs)
+
+    def __iter__(self):
+        return self.__handle_accessor("__iter__")
+
+    def __contains__(self, *args, **kwargs):
+        return self.__handle_accessor("__contains__", *args, **kwargs)
+
+    def __len__(self):
+        return self.__handle_accessor("__len__")
+
+    def __str__(self):
+        return self.__handle_accessor("__str__")
+
+    def _fetch(self):
+        """ Fetches the data unless another thread already has """
+        with self._lock:
+            if not self._fetched:
+                self.call()
+
+    def call(self):
+        """ Make the API call again and fetch fresh data. """
+        with self._lock:
+            self._load(self._downloader.download())
+
+    def _load(self, data):
+        started = time.time()
+        self.update(decode_json(data))
+        self._fetched = True
+
+        if hooks.active():
+            hooks.emit("decode", self._downloader._event(decode_time=time.time() - started,
+                                                         decoded_bytes=len(data)))
+
+    @property
+    def last_modified(self):
+        """ Last-Modified of the last fetch, can be passed back as since """
+        return self._downloader.last_modified
+
+    @property
+    def etag(self):
+        """ ETag of the last fetch, can be passed back as etag """
+        return self._downloader.etag
+
+    @property
+    def wire_bytes(self):
+        """ Bytes received over the network for the last fetch """
+        return self._downloader.wire_bytes
+
+    @property
+    def decoded_bytes(self):
+        """ Bytes of JSON the last fetch decompressed to """
+        return self._downloader.decoded_bytes
+
+    def stream(self, *path):
+        """ Downloads the result again, yielding the elements of the array
+        under the given keys as they arrive (e.g. stream("applist", "apps"))
+        instead of loading the whole response at once. When exhausted this
+        object holds the rest of the response with that array left empty. """
+        stream = json_stream(self._downloader.iter_content(), path)
+
+        for element in stream:
+            yield element
+
+        with self._lock:
+            self.clear()
+            self.update(stream.rest)
+            self._fetched = True
+
+    def get(self, *args, **kwargs):
+        return self.__handle_accessor("get", *args, **kwargs)
+
+    def keys(self):
+        return self.__handle_accessor("keys")
+
+
+def _restore_result(cls, data, downloader, fetched):
+    result = cls.__new__(cls)
+    dict.update(result, data)
+    result._downloader = downloader
+    result._fetched = fetched
+    result._lock = _fetch_lock()
+
+    return result
+
+
+def _fetchers(obj):
+    """ Returns what has to be called to load obj. Objects that don't keep
+    their results in method_result attributes can define _prefetch. """
+    if isinstance(obj, method_result):
+        results = [obj]
+    else:
+        prefetch = getattr(obj, "_prefetch", None)
+        if prefetch:
+            return [prefetch]
+        results = [v for v in getattr(obj, "__dict__", {}).values() if isinstance(v, method_result)]
+
+    return [res._fetch for res in results if not res._fetched]
+
+
+def fetch_all(objects, workers=8):
+    """ Fetches lazy results (method_result objects or high level objects
+    like user.profile and items.inventory) concurrently using up to
+    'workers' threads, so they're already loaded when accessed. Returns a
+    list holding the exception each object's fetch raised, or None, in the
+    same order as 'objects'. One failure doesn't stop the others. Unfetched
+    async results fail with APIError, await them instead. """
+    objects = list(objects)
+    errors = [None] * len(objects)
+    jobs = [(i, fetch) for i, obj in enumerate(objects) for fetch in _fetchers(obj)]
+
+    def run(job):
+        i, fetch = job
+        try:
+            fetch()
+        except Exception as E:
+            if errors[i] is None:
+                errors[i] = E
+
+    if jobs:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+            list(pool.map(run, jobs))
+
+    return errors
+
+
+async def _async_iter_body(reader, status_code, headers, chunk_size):
+    """ Yields the raw body of a response as it arrives """
+    if status_code in (204, 304) or 100 <= status_code < 200:
+        return
+
+    if "chunked" in headers.get("transfer-encoding", '').lower():
+        while True:
+            size = int((await reader.readline()).split(b';')[0].strip(), 16)
+
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()).strip():
+                    pass
+                return
+
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    elif headers.get("content-length") is not None:
+        remaining = int(headers["content-length"])
+
+        while remaining > 0:
+            chunk = await reader.readexactly(min(remaining, chunk_size))
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        while True:
+            chunk = await reader.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class async_http_downloader(http_downloader):
+    """ asyncio counterpart to http_downloader. The socket is never blocked
+    on, so any number of downloads can run concurrently on one event loop.
+    Each request uses its own connection. """
+
+    _max_redirects = 5
+    _ssl_context = None
+
+    @classmethod
+    def _get_ssl_context(cls):
+        if not cls._ssl_context:
+            cls._ssl_context = ssl.create_default_context()
+
+        return cls._ssl_context
+
+    async def _exchange(self, url, method, headers, body):
+        import asyncio
+
+        parts = urlsplit(url)
+        https = parts.scheme.lower() == "https"
+        port = parts.port or (443 if https else 80)
+        proxy = _proxy_for(parts.scheme.lower(), parts.hostname)
+        started = time.time()
+
+        try:
+            if proxy:
+                reader, writer = await asyncio.open_connection(proxy[0], proxy[1])
+            else:
+                reader, writer = await asyncio.open_connection(parts.hostname, port,
+                                                               ssl=self._get_ssl_context() if https else None)
+        except asyncio.TimeoutError:
+            raise
+        except socket.error as E:
+            raise urlerror.URLError(E)
+
+        try:
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            if proxy and https:
+                await self._tunnel(reader, writer, parts.hostname, port, proxy)
+            elif proxy:
+                path = urlunsplit((parts.scheme, parts.netloc, path, '', ''))
+
+            head = ["{0} {1} HTTP/1.1".format(method, path),
+                    "Host: " + parts.netloc,
+                    "Connection: close"]
+
+            if proxy and not https and proxy[2]:
+                head.append("Proxy-Authorization: " + proxy[2])
+
+            for k, v in headers.items():
+                head.append("{0}: {1}".format(k, v))
+
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            if body is not None:
+                writer.write(body)
+            await writer.drain()
+
+            status_line = (await reader.readline()).decode("latin-1").split(None, 2)
+            status_code = int(status_line[1])
+            reason = status_line[2].strip() if len(status_line) > 2 else ''
+            self._ttfb = time.time() - started
+
+            raw_headers = []
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                raw_headers.append(line)
+            res_headers = httplib.parse_headers(io.BytesIO(b''.join(raw_headers) + b"\r\n"))
+
+            decoder = _content_decoder(res_headers.get("content-encoding"))
+            chunks = []
+            started = time.time()
+
+            async for chunk in _async_iter_body(reader, status_code, res_headers, self._chunk_size):
+                chunks.append(decoder.decode(chunk))
+
+            chunks.append(decoder.flush())
+            self._download_time = time.time() - started
+        finally:
+            writer.close()
+
+        self._wire_bytes = decoder.wire_bytes
+        self._decoded_bytes = decoder.decoded_bytes
+
+        return status_code, reason, res_headers, b''.join(chunks)
+
+    async def _tunnel(self, reader, writer, host, port, proxy):
+        """ Opens a CONNECT tunnel through the proxy and starts TLS in it """
+        head = ["CONNECT {0}:{1} HTTP/1.1".format(host, port), "Host: {0}:{1}".format(host, port)]
+        if proxy[2]:
+            head.append("Proxy-Authorization: " + proxy[2])
+
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode("latin-1").split(None, 2)
+        while (await reader.readline()).strip():
+            pass
+
+        if len(status_line) < 2 or status_line[1] != "200":
+            raise urlerror.URLError("Tunnel connection failed: " + ' '.join(status_line[1:]).strip())
+
+        if not hasattr(writer, "start_tls"):
+            raise urlerror.URLError("HTTPS through a proxy needs Python 3.11 or later with asyncio")
+
+        await writer.start_tls(self._get_ssl_context(), server_hostname=host)
+
+    async def _request(self, url, headers, body):
+        redirects = 0
+
+        while True:
+            head = dict(headers)
+            if body is not None:
+                method = "POST"
+                head["Content-Type"] = "application/x-www-form-urlencoded"
+                head["Content-Length"] = str(len(body))
+            else:
+                method = "GET"
+
+            res = await self._exchange(url, method, head, body)
+            location = res[2].get("location")
+
+            if res[0] not in connection_pool._redirect_codes or not location:
+                return res
+
+            redirects += 1
+            if redirects > self._max_redirects:
+                raise HTTPError("Server connection failed: Too many redirects ({0})".format(res[0]))
+
+            url = urljoin(url, location)
+            if res[0] not in (307, 308):
+                body = None
+
+    async def download(self):
+        policy = retries.get()
+
+        if policy:
+            return await policy._async_run(self._expires(), self._download, (), {})
+
+        return await self._download()
+
+    async def _download(self):
+        if not hooks.active():
+            return await self._cached_download()
+
+        started = self._request_started()
+        error = None
+
+        try:
+            return await self._cached_download()
+        except Exception as E:
+            error = E
+            raise
+        finally:
+            self._request_ended(started, error)
+
+    async def _cached_download(self):
+        store, key, cached = self._cache_lookup()
+
+        if self._cache_fresh(store, cached):
+            return self._cache_hit(store, key, cached)
+
+        try:
+            body, headers = await self._guarded_fetch(self._build_headers(cached))
+        except HTTPStale:
+            if not cached:
+                raise
+            return self._cache_hit(store, key, cached, revalidated=True)
+
+        self._cache_store(store, key, body, headers)
+
+        return body
+
+    async def _guarded_fetch(self, head):
+        breaker = circuit_breakers.get()
+
+        if not breaker:
+            return await self._keyed_fetch(head)
+
+        name = self._circuit_name()
+        breaker.before(name)
+        self._status = None
+
+        try:
+            res = await self._keyed_fetch(head)
+        except BaseException as E:
+            self._settle(breaker, name, E)
+            raise
+
+        breaker.settle(name)
+
+        return res
+
+    async def _keyed_fetch(self, head):
+        pool = key_pool.get()
+
+        if not pool or not self._is_pooled(pool):
+            return await self._limited_fetch(head)
+
+        apikey = self._pooled_key(pool)
+        if not apikey:
+            raise APIKeyMissingError("No API key in the pool is available")
+
+        while True:
+            try:
+                return await self._limited_fetch(head)
+            except HTTPTooManyRequestsError as E:
+                pool.throttled(apikey, E.retry_after)
+                raise
+            except HTTPForbiddenError:
+                pool.revoked(apikey)
+                apikey = self._pooled_key(pool)
+                if not apikey:
+                    raise
+
+    async def _limited_fetch(self, head):
+        limiter = rate_limiter.get()
+
+        if not limiter:
+            return await self._fetch(head)
+
+        bucket = self._rate_bucket()
+        await limiter.async_acquire(*bucket)
+
+        try:
+            res = await self._fetch(head)
+        except HTTPTooManyRequestsError as E:
+            limiter.throttled(bucket[0], bucket[1], E.retry_after)
+            raise
+        except HTTPStale:
+            limiter.succeeded(*bucket)
+            raise
+
+        limiter.succeeded(*bucket)
+
+        return res
+
+    async def _fetch(self, head):
+        import asyncio
+
+        body = self._build_body()
+        timeout = self._request_timeout()
+
+        try:
+            status_code, reason, headers, body = await asyncio.wait_for(self._request(self._url, head, body),
+                                                                        timeout)
+        except (asyncio.TimeoutError, urlerror.URLError):
+            raise self._timed_out()
+        except (socket.error, ValueError, IndexError, asyncio.IncompleteReadError, zlib.error) as E:
+            raise HTTPError("Server read error: {0}".format(E))
+
+        self._handle_response(status_code, reason, headers)
+
+        return body, headers
+
+
+class async_method_result(method_result):
+    """ method_result that is fetched with asyncio, as returned by
+    async_interface. Results are already fetched once awaited, and calling
+    them again returns an awaitable. """
+
+    _downloader_class = async_http_downloader
+
+    def _fetch(self):
+        """ Unfetched async results can't be loaded on access (or by
+        fetch_all), there's no event loop to run the download on """
+        if not self._fetched:
+            raise APIError("Async result not fetched yet, await result.call() first")
+
+    async def call(self):
+        """ Make the API call again and fetch fresh data. """
+        self._load(await self._downloader.download())
+
+
+class _async_interface_method(_interface_method):
+    async def __call__(self, version=1, timeout=None, since=None,
+                       data={}, etag=None, **kwargs):
+        url = self._build_url(version, kwargs)
+        result = async_method_result(url, last_modified=since, timeout=timeout, data=data, etag=etag)
+        await result.call()
+
+        return result
+
+
+class async_interface(interface):
+    """ Same as interface except that methods return awaitables, e.g.
+    await async_interface("ISteamUser").GetPlayerSummaries(steamids=sid) """
+
+    def __getattr__(self, name):
+        return _async_interface_method(self._iface, name)
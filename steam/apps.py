@@ -12,7 +12,12 @@ class AppError(api.APIError):
 
 
 class app_list(object):
-    """ Retrieves a list of all Steam apps with their ID and localized name. """
+    """ Retrieves a list of all Steam apps with their ID and localized name.
+    If stream is True the list isn't kept in memory, instead every iteration
+    streams it from the API as it downloads. That includes looking apps up
+    by ID or name (other than the builtin ones), which downloads the list
+    again each time. len() never downloads it, it's only known once the
+    list has been iterated to the end and raises TypeError until then. """
     _builtin = {
             753: "Steam",
             440: "Team Fortress 2",
@@ -41,15 +46,24 @@ class app_list(object):
                     return app, name
             raise
 
-    def __init__(self, **kwargs):
-        self._api = api.interface("ISteamApps").GetAppList(version=2,
-                                                           **kwargs)
+    def __init__(self, stream=False, **kwargs):
+        with api.tagged("apps.app_list"):
+            self._api = api.interface("ISteamApps").GetAppList(version=2,
+                                                               **kwargs)
         self._cache = {}
+        self._stream = stream
+        self._count = None
 
     def __iter__(self):
         return next(self)
 
     def __len__(self):
+        if self._stream:
+            # Otherwise list(app_list(stream=True)) would download it twice
+            if self._count is None:
+                raise TypeError("Streamed app list length is unknown until it's iterated")
+            return self._count
+
         return len(self._apps)
 
     @property
@@ -62,6 +76,21 @@ class app_list(object):
         return self._cache
 
     def __next__(self):
+        if self._stream:
+            count = 0
+            for app in self._api.stream("applist", "apps"):
+                count += 1
+                yield (app["appid"], app["name"])
+
+            # What's left once streamed has the list emptied, not gone
+            try:
+                self._api["applist"]["apps"]
+            except KeyError:
+                raise AppError("Bad app list returned")
+
+            self._count = count
+            return
+
         i = 0
         data = self._apps
 
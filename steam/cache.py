@@ -0,0 +1,370 @@
+"""
+Response caches for the API layer
+Copyright (c) 2010+, Anthony Garcia <anthony@lagg.me>
+Distributed under the ISC License (see LICENSE)
+"""
+
+import os
+import json
+import time
+import hashlib
+import fnmatch
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    from urllib.parse import urlencode, urlsplit, urlunsplit, parse_qsl
+except ImportError:
+    from urllib import urlencode
+    from urlparse import urlsplit, urlunsplit, parse_qsl
+
+
+def canonical_key(url, data=None, exclude=("key",)):
+    """ Builds a cache key out of a URL and optional POST data. Query
+    arguments are sorted, and arguments named in 'exclude' (the API key by
+    default) are left out so that the same resource maps to the same key no
+    matter who asked for it. """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in exclude)
+    key = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path,
+                      urlencode(query), ''))
+
+    if data:
+        key += ' ' + urlencode(sorted((str(k), str(v)) for k, v in data.items()))
+
+    return key
+
+
+class entry(object):
+    """ A cached response body along with the validators needed to revalidate it """
+
+    __slots__ = ("body", "last_modified", "etag", "stored")
+
+    def __init__(self, body, last_modified=None, etag=None, stored=None):
+        self.body = body
+        self.last_modified = last_modified
+        self.etag = etag
+        self.stored = stored or time.time()
+
+    @property
+    def age(self):
+        """ Seconds since the entry was stored or last revalidated """
+        return time.time() - self.stored
+
+
+class backend(object):
+    """ Base class for response stores. Keys are strings as returned
+    by canonical_key, values are entry objects.
+
+    Entries younger than their TTL are served without touching the network,
+    older ones are revalidated. 'ttl' is the default in seconds and
+    'policies' maps interfaces or methods to their own TTL, for example
+    {"IEconItems_440/GetSchemaItems": 3600, "ISteamUser": 10}. Keys may be
+    glob patterns such as "IEconItems_*/GetSchema*". """
+
+    def __init__(self, ttl=0, policies=None):
+        self._ttl = ttl
+        self._policies = dict(policies or {})
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(("hits", "revalidations", "misses", "evictions"), 0)
+
+    def ttl(self, iface=None, method=None):
+        """ Returns how many seconds responses of the given interface
+        method are considered fresh """
+        name = "{0}/{1}".format(iface, method)
+
+        for policy in (name, iface):
+            if policy in self._policies:
+                return self._policies[policy]
+
+        if iface:
+            for pattern, ttl in self._policies.items():
+                if fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(iface, pattern):
+                    return ttl
+
+        return self._ttl
+
+    def count(self, stat, n=1):
+        with self._stats_lock:
+            self._stats[stat] = self._stats.get(stat, 0) + n
+
+    @property
+    def stats(self):
+        """ Counts of responses served fresh from the cache (hits), served
+        after a 304 (revalidations), downloaded in full (misses) and entries
+        dropped to make room (evictions) """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def get(self, key):
+        """ Returns the entry stored for key, or None """
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class disk_cache(backend):
+    """ Stores responses as files in the given directory so they outlive the
+    process. Each file holds a line of JSON metadata followed by the body,
+    and is written to a temporary file first and then moved into place so
+    readers never see partial entries. """
+
+    def __init__(self, path, ttl=0, policies=None):
+        super(disk_cache, self).__init__(ttl, policies)
+        self._path = path
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _filename(self, key):
+        return os.path.join(self._path, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._filename(key), "rb") as cached:
+                meta = json.loads(cached.readline().decode("utf-8"))
+                if meta["key"] != key:
+                    return None
+                return entry(cached.read(), meta["last_modified"], meta["etag"], meta["stored"])
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key, value):
+        meta = {"key": key,
+                "last_modified": value.last_modified,
+                "etag": value.etag,
+                "stored": value.stored}
+        fd, tmpname = tempfile.mkstemp(dir=self._path, prefix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as cached:
+                cached.write(json.dumps(meta).encode("utf-8") + b"\n")
+                cached.write(value.body)
+            os.replace(tmpname, self._filename(key))
+        except:
+            os.unlink(tmpname)
+            raise
+
+    def delete(self, key):
+        try:
+            os.unlink(self._filename(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self._path):
+            # Only touch what looks like ours
+            if len(name) != 40 and not name.startswith(".tmp"):
+                continue
+            try:
+                os.unlink(os.path.join(self._path, name))
+            except OSError:
+                pass
+
+
+class memory_cache(backend):
+    """ Keeps responses in process memory. Once the bodies add up to more
+    than 'max_bytes' (or there are more than 'max_entries' of them) the least
+    recently used entries are evicted. """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=None, ttl=0, policies=None):
+        super(memory_cache, self).__init__(ttl, policies)
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        evicted = 0
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._size -= len(old.body)
+
+            if len(value.body) > self._max_bytes:
+                return
+
+            self._entries[key] = value
+            self._size += len(value.body)
+
+            while (self._size > self._max_bytes or
+                   (self._max_entries and len(self._entries) > self._max_entries)):
+                oldkey, oldvalue = self._entries.popitem(last=False)
+                self._size -= len(oldvalue.body)
+                evicted += 1
+
+        if evicted:
+            self.count("evictions", evicted)
+
+    def delete(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._size -= len(old.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self):
+        """ Total size of the cached bodies in bytes """
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class sqlite_cache(backend):
+    """ Stores responses in an SQLite database in WAL mode, so that every
+    process on the machine can share it. Writes are transactions, and once
+    the bodies add up to more than 'max_bytes' the least recently used
+    entries are evicted. 'timeout' is how long to wait for other writers. """
+
+    # Seconds between recording reads of the same entry, recency only needs
+    # to be roughly right and this keeps hot entries from writing on every read
+    _touch_interval = 1
+
+    # Seconds a read waits to record itself behind a writer before giving up
+    _touch_timeout = 0.05
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=0, policies=None, timeout=30):
+        super(sqlite_cache, self).__init__(ttl, policies)
+        self._path = path
+        self._max_bytes = max_bytes
+        self._timeout = timeout
+        self._local = threading.local()
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        self._write(lambda conn: conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, last_modified TEXT, etag TEXT, "
+            "stored REAL NOT NULL, used REAL NOT NULL, size INTEGER NOT NULL)"))
+        self._write(lambda conn: conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_used ON responses (used)"))
+
+    def _connection(self):
+        """ Connections can't be shared between threads or forked processes,
+        so each gets its own """
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def _write(self, func):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            result = func(conn)
+        except:
+            conn.execute("ROLLBACK")
+            raise
+
+        conn.execute("COMMIT")
+
+        return result
+
+    def get(self, key):
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT body, last_modified, etag, stored, used FROM responses WHERE key = ?",
+                               (key,)).fetchone()
+
+            if not row:
+                return None
+
+            now = time.time()
+            if now - row[4] >= self._touch_interval:
+                self._touch(conn, key, now)
+
+            return entry(bytes(row[0]), row[1], row[2], row[3])
+        except sqlite3.Error:
+            return None
+
+    def _touch(self, conn, key, now):
+        """ Records a read for eviction. That's only a hint, so it doesn't
+        wait long for the write lock and a failure doesn't lose the read """
+        try:
+            conn.execute("PRAGMA busy_timeout = {0:d}".format(int(self._touch_timeout * 1000)))
+            try:
+                conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+            finally:
+                conn.execute("PRAGMA busy_timeout = {0:d}".format(int(self._timeout * 1000)))
+        except sqlite3.Error:
+            pass
+
+    def set(self, key, value):
+        size = len(value.body)
+
+        if size > self._max_bytes:
+            return
+
+        def store(conn):
+            now = time.time()
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, sqlite3.Binary(value.body), value.last_modified, value.etag,
+                          value.stored, now, size))
+
+            excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0] - self._max_bytes
+            evicted = []
+
+            if excess > 0:
+                for oldkey, oldsize in conn.execute("SELECT key, size FROM responses WHERE key != ? "
+                                                    "ORDER BY used", (key,)).fetchall():
+                    if excess <= 0:
+                        break
+                    evicted.append((oldkey,))
+                    excess -= oldsize
+
+                conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+            return len(evicted)
+
+        evicted = self._write(store)
+
+        if evicted:
+            self.count("evictions", evicted)
+
+    def delete(self, key):
+        self._write(lambda conn: conn.execute("DELETE FROM responses WHERE key = ?", (key,)))
+
+    def clear(self):
+        self._write(lambda conn: conn.execute("DELETE FROM responses"))
+
+    @property
+    def size(self):
+        """ Total size of the cached bodies in bytes """
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,169 @@
+"""
+Diagnostics for how API traffic is generated, gathered through api.hooks
+Copyright (c) 2010+, Anthony Garcia <anthony@lagg.me>
+Distributed under the ISC License (see LICENSE)
+"""
+
+import os
+import time
+import warnings
+import threading
+import traceback
+import collections
+
+from . import api
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+_PACKAGE = os.path.dirname(os.path.abspath(api.__file__))
+
+# Frames in these are plumbing, not what asked for the data
+_INTERNAL = set(os.path.join(_PACKAGE, name) for name in ("api.py", "cache.py", "diagnostics.py"))
+
+# Calls that have a batched counterpart taking many IDs at once
+BATCHED = {
+    ("ISteamUser", "GetPlayerSummaries"): "user.profile_batch",
+    ("ISteamUser", "GetPlayerBans"): "user.bans_batch",
+}
+
+
+class NPlusOneWarning(UserWarning):
+    """ Issued when the same call is made over and over in a short time,
+    typically one lazy object per iteration of a loop """
+    pass
+
+
+def _where(frame):
+    return "{0}:{1} in {2}".format(os.path.basename(frame[0]), frame[1], frame[2])
+
+
+class n_plus_one_detector(object):
+    """ Records where every network fetch was triggered from and warns with
+    NPlusOneWarning when the same interface and method (or host, for other
+    URLs) is fetched more than 'threshold' times within 'window' seconds.
+    Warnings point at the code outside steamodd that caused the fetches and
+    name the batched call to use instead where there is one. 'ignore' lists
+    methods (or "interface/method") that are expected to repeat, like
+    schema pages. Cache hits aren't network fetches and don't count.
+    install() registers it with api.hooks. Meant for development, capturing
+    the stack of every request isn't free. """
+
+    def __init__(self, threshold=10, window=1.0, ignore=("GetSchemaItems",), max_records=1000,
+                 stack_depth=8):
+        self.threshold = threshold
+        self.window = window
+        self.ignore = set(ignore)
+        self.stack_depth = stack_depth
+        self._records = collections.deque(maxlen=max_records)
+        self._recent = {}
+        self._warned = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def install(self):
+        api.hooks.register(self)
+        return self
+
+    def uninstall(self):
+        api.hooks.unregister(self)
+
+    def _name(self, details):
+        if details["interface"]:
+            return "{0}/{1}".format(details["interface"], details["method"])
+
+        return urlsplit(details["url"]).hostname
+
+    def _ignored(self, details, name):
+        return name in self.ignore or details["method"] in self.ignore
+
+    def _stack(self):
+        """ Returns (trigger, site, stack). trigger is the innermost steamodd
+        frame that isn't plumbing, usually the property that needed the
+        data, and site the innermost frame outside of steamodd. """
+        frames = [f for f in traceback.extract_stack() if os.path.abspath(f[0]) not in _INTERNAL]
+        trigger = site = None
+
+        for frame in reversed(frames):
+            inside = os.path.abspath(frame[0]).startswith(_PACKAGE + os.sep)
+            if inside and not trigger and not site:
+                trigger = frame
+            elif not inside:
+                site = frame
+                break
+
+        return trigger, site, [_where(f) for f in frames[-self.stack_depth:]]
+
+    def __call__(self, event, details):
+        if event != "request_end" or details["cache"] == "hit":
+            return
+
+        name = self._name(details)
+        if self._ignored(details, name):
+            return
+
+        trigger, site, stack = self._stack()
+        now = time.time()
+        record = {"time": now, "name": name, "url": details["url"], "tag": details["tag"],
+                  "trigger": trigger and _where(trigger), "site": site and _where(site), "stack": stack}
+        warn = False
+
+        with self._lock:
+            self._records.append(record)
+
+            stats = self._stats.setdefault(name, {"fetches": 0, "warnings": 0, "sites": {}})
+            stats["fetches"] += 1
+            stats["sites"][record["site"]] = stats["sites"].get(record["site"], 0) + 1
+
+            recent = self._recent.setdefault(name, collections.deque())
+            recent.append(now)
+            while recent[0] < now - self.window:
+                recent.popleft()
+
+            if len(recent) > self.threshold and self._warned.get(name, 0) < now - self.window:
+                self._warned[name] = now
+                stats["warnings"] += 1
+                warn = True
+
+        if warn:
+            self._warn(details, record, len(recent), site)
+
+    def _warn(self, details, record, count, site):
+        message = "{0} was fetched {1} times within {2}s".format(record["name"], count, self.window)
+
+        if record["trigger"]:
+            message += ", most recently by " + record["trigger"]
+        if record["site"]:
+            message += " from " + record["site"]
+
+        batched = BATCHED.get((details["interface"], details["method"]))
+        if batched:
+            message += ". {0} fetches many at once".format(batched)
+
+        filename, lineno = (site[0], site[1]) if site else ("<steamodd>", 0)
+        warnings.warn_explicit(message, NPlusOneWarning, filename, lineno)
+
+    @property
+    def records(self):
+        """ The most recent fetches, oldest first, with the name of what was
+        fetched, the property that triggered it, the call site outside
+        steamodd and the innermost frames of the stack """
+        with self._lock:
+            return list(self._records)
+
+    @property
+    def stats(self):
+        """ Fetches and warnings per call, and how many fetches came from
+        each call site """
+        with self._lock:
+            return dict((name, dict(stats, sites=dict(stats["sites"])))
+                        for name, stats in self._stats.items())
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+            self._recent.clear()
+            self._warned.clear()
+            self._stats.clear()
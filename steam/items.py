@@ -49,15 +49,37 @@ class schema(object):
         if self._cache:
             return self._cache
 
+        with self._lock:
+            # Built aside so other threads never see half of it
+            if not self._cache:
+                with self._budget():
+                    self._cache = self._build_schema()
+
+        return self._cache
+
+    def _budget(self):
+        """ The deadline of the schema's requests, which starts with the first one """
+        if self._started is None:
+            self._started = api.deadline(self._deadline)
+
+        return self._started
+
+    def _build_schema(self):
+        cache = {}
+
+        if self._stream and self._items is None:
+            # Stream the bulk of the schema, which leaves the rest in _api
+            self._items = list(self._api.stream("result", "items"))
+
         try:
             status = self._api["result"]["status"]
 
             # Client schema URL
-            self._cache["client"] = self._api["result"]["items_game_url"]
+            cache["client"] = self._api["result"]["items_game_url"]
 
             # ID:name origin map
             onames = self._api["result"].get("originNames", [])
-            self._cache["origins"] = dict([(o["origin"], o["name"]) for o in onames])
+            cache["origins"] = dict([(o["origin"], o["name"]) for o in onames])
 
             # Two maps are built here, one for name:ID and one for ID:loc name.
             # Most of the time qualities will be resolved by ID (as that's what
@@ -70,8 +92,8 @@ class schema(object):
                 idname = k.lower()
                 qualities[v] = (v, idname, locname)
                 quality_names[idname] = v
-            self._cache["qualities"] = qualities
-            self._cache["quality_names"] = quality_names
+            cache["qualities"] = qualities
+            cache["quality_names"] = quality_names
 
             # Two maps are built here, one for name:ID and one for
             # ID:attribute. As with qualities it's mostly the schema that needs
@@ -83,20 +105,20 @@ class schema(object):
                 attrid = attrib["defindex"]
                 attributes[attrid] = attrib
                 attribute_names[attrib["name"].lower()] = attrid
-            self._cache["attributes"] = attributes
-            self._cache["attribute_names"] = attribute_names
+            cache["attributes"] = attributes
+            cache["attribute_names"] = attribute_names
 
             # ID:system particle map
             particles = self._api["result"].get("attribute_controlled_attached_particles", [])
-            self._cache["particles"] = dict([(p["id"], p) for p in particles])
+            cache["particles"] = dict([(p["id"], p) for p in particles])
 
             # Name:level eater rank map
             levels = self._api["result"].get("item_levels", [])
-            self._cache["eater_ranks"] = dict([(l["name"], l["levels"]) for l in levels])
+            cache["eater_ranks"] = dict([(l["name"], l["levels"]) for l in levels])
 
             # Type ID:Type eater score count types
             killtypes = self._api["result"].get("kill_eater_score_types", [])
-            self._cache["eater_types"] = dict([(k["type"], k) for k in killtypes])
+            cache["eater_types"] = dict([(k["type"], k) for k in killtypes])
 
             # Schema ID:item map (building this is insanely fast, overhead is
             # minimal compared to lookup benefits in backpacks)
@@ -104,7 +126,7 @@ class schema(object):
                 items = self._items
             else:
                 items = self._api["result"]["items"]
-            self._cache["items"] = dict([(i["defindex"], i) for i in items])
+            cache["items"] = dict([(i["defindex"], i) for i in items])
         except KeyError:
             # Due to the various fields needed we can't check for certain
             # fields and fall back ala 'inventory'
@@ -114,7 +136,7 @@ class schema(object):
             else:
                 raise SchemaError("Empty or corrupt schema returned")
 
-        return self._cache
+        return cache
 
     @property
     def client_url(self):
@@ -233,33 +255,46 @@ class schema(object):
     def __len__(self):
         return len(self._schema["items"])
 
-    def __init__(self, app, lang=None, version=1, **kwargs):
+    def __init__(self, app, lang=None, version=1, stream=False, deadline=None, **kwargs):
         """ schema will be used to initialize the schema if given,
         lang can be any ISO language code.
-        lm will be used to generate an HTTP If-Modified-Since header. """
+        lm will be used to generate an HTTP If-Modified-Since header.
+        stream parses item lists as they download instead of loading
+        whole responses first, which keeps peak memory down.
+        deadline caps the seconds all of the schema's requests may take,
+        counted from when the first of them is sent. """
 
         self._language = loc.language(lang).code
         self._app = int(app)
         self._cache = {}
+        self._stream = stream
+        self._lock = api._fetch_lock()
+        self._deadline = deadline
+        self._started = None
 
         # WORKAROUND: CS GO v1 returns 404
         if self._app == 730 and version == 1:
             version = 2
 
-        # WORKAROUND: certain apps have moved to GetSchemaOverview/GetSchemaItems
-        if self._app in [440]:
-            self._api = api.interface("IEconItems_" + str(self._app)).GetSchemaOverview(language=self._language, version=version, **kwargs)
-            items = []
-            next_start = 0
-            # HACK: build the entire item list immediately because Valve decided not to allow us to get the entire thing at once
-            while next_start is not None:
-                next_items = api.interface("IEconItems_" + str(self._app)).GetSchemaItems(language=self._language, version=version, aggressive=True, start=next_start, **kwargs)
-                items.extend(next_items["result"]["items"])
-                next_start = next_items["result"].get("next", None)
-            self._items = items
-        else:
-            self._api = api.interface("IEconItems_" + str(self._app)).GetSchema(language=self._language, version=version, **kwargs)
-            self._items = None
+        with api.tagged("items.schema"):
+            # WORKAROUND: certain apps have moved to GetSchemaOverview/GetSchemaItems
+            if self._app in [440]:
+                self._api = api.interface("IEconItems_" + str(self._app)).GetSchemaOverview(language=self._language, version=version, **kwargs)
+                items = []
+                next_start = 0
+                # HACK: build the entire item list immediately because Valve decided not to allow us to get the entire thing at once
+                while next_start is not None:
+                    with self._budget():
+                        next_items = api.interface("IEconItems_" + str(self._app)).GetSchemaItems(language=self._language, version=version, aggressive=not stream, start=next_start, **kwargs)
+                        if stream:
+                            items.extend(next_items.stream("result", "items"))
+                        else:
+                            items.extend(next_items["result"]["items"])
+                    next_start = next_items["result"].get("next", None)
+                self._items = items
+            else:
+                self._api = api.interface("IEconItems_" + str(self._app)).GetSchema(language=self._language, version=version, **kwargs)
+                self._items = None
 
 
 class item(object):
@@ -939,7 +974,8 @@ class inventory(object):
         except:
             sid = str(profile)
 
-        self._api = api.interface("IEconItems_" + str(self._app)).GetPlayerItems(SteamID=sid, **kwargs)
+        with api.tagged("items.inventory"):
+            self._api = api.interface("IEconItems_" + str(self._app)).GetPlayerItems(SteamID=sid, **kwargs)
 
 
 class asset_item:
@@ -1054,4 +1090,5 @@ class assets(object):
         self._app = app
         self._cache = {}
 
-        self._api = api.interface("ISteamEconomy").GetAssetPrices(language=self._language, appid=self._app, **kwargs)
+        with api.tagged("items.assets"):
+            self._api = api.interface("ISteamEconomy").GetAssetPrices(language=self._language, appid=self._app, **kwargs)
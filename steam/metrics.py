@@ -0,0 +1,203 @@
+"""
+Metrics for API traffic, gathered through api.hooks
+Copyright (c) 2010+, Anthony Garcia <anthony@lagg.me>
+Distributed under the ISC License (see LICENSE)
+"""
+
+import socket
+import threading
+
+from . import api
+
+# Seconds, roughly what the Web API spans between a warm cache and a timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _exporter(object):
+    """ Base class for hooks that can register themselves """
+
+    def install(self):
+        api.hooks.register(self)
+        return self
+
+    def uninstall(self):
+        api.hooks.unregister(self)
+
+    def __call__(self, event, details):
+        raise NotImplementedError
+
+
+class _histogram(object):
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return '{' + ','.join('{0}="{1}"'.format(k, _escape(v)) for k, v in pairs) + '}'
+
+
+class collector(_exporter):
+    """ Aggregates request latency, status and error counts, cache outcomes
+    and bytes transferred per interface and method, and renders them in the
+    Prometheus text format. install() registers it with api.hooks. """
+
+    _label_names = ("interface", "method")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix="steamodd"):
+        self._buckets = tuple(sorted(buckets))
+        self._prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._latency = {}
+            self._decode = {}
+            self._requests = {}
+            self._errors = {}
+            self._cache = {}
+            self._wire_bytes = {}
+            self._decoded_bytes = {}
+
+    @staticmethod
+    def _bump(counter, key, n=1):
+        counter[key] = counter.get(key, 0) + n
+
+    def _histogram(self, histograms, key):
+        hist = histograms.get(key)
+
+        if not hist:
+            hist = histograms[key] = _histogram(self._buckets)
+
+        return hist
+
+    def __call__(self, event, details):
+        # Other events, like circuit_state, aren't about a single request
+        if event not in ("request_end", "decode"):
+            return
+
+        endpoint = (details["interface"] or '', details["method"] or '')
+
+        with self._lock:
+            if event == "request_end":
+                self._histogram(self._latency, endpoint).observe(self._buckets, details["duration"])
+                self._bump(self._requests, endpoint + (str(details["status"] or ''),))
+                self._bump(self._wire_bytes, endpoint, details["wire_bytes"])
+                self._bump(self._decoded_bytes, endpoint, details["decoded_bytes"])
+                if details["error"]:
+                    self._bump(self._errors, endpoint + (details["error"],))
+                if details["cache"]:
+                    self._bump(self._cache, endpoint + (details["cache"],))
+            elif event == "decode":
+                self._histogram(self._decode, endpoint).observe(self._buckets, details["decode_time"])
+
+    def _render_histogram(self, lines, name, doc, histograms):
+        lines.append("# HELP {0} {1}".format(name, doc))
+        lines.append("# TYPE {0} histogram".format(name))
+
+        for key, hist in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets, hist.counts):
+                cumulative += count
+                le = (("le", repr(float(bound))),)
+                lines.append("{0}_bucket{1} {2}".format(name, _labels(self._label_names, key, le), cumulative))
+            lines.append("{0}_bucket{1} {2}".format(name, _labels(self._label_names, key, (("le", "+Inf"),)),
+                                                    hist.count))
+            lines.append("{0}_sum{1} {2!r}".format(name, _labels(self._label_names, key), float(hist.sum)))
+            lines.append("{0}_count{1} {2}".format(name, _labels(self._label_names, key), hist.count))
+
+    def _render_counter(self, lines, name, doc, counter, extra_label=None):
+        names = self._label_names + ((extra_label,) if extra_label else ())
+
+        lines.append("# HELP {0} {1}".format(name, doc))
+        lines.append("# TYPE {0} counter".format(name))
+
+        for key, value in sorted(counter.items()):
+            lines.append("{0}{1} {2}".format(name, _labels(names, key), value))
+
+    def prometheus(self):
+        """ Returns the metrics in the Prometheus text exposition format """
+        p = self._prefix
+        lines = []
+
+        with self._lock:
+            self._render_histogram(lines, p + "_request_duration_seconds",
+                                   "Time taken by API requests", self._latency)
+            self._render_histogram(lines, p + "_decode_duration_seconds",
+                                   "Time taken to parse JSON responses", self._decode)
+            self._render_counter(lines, p + "_requests_total",
+                                 "API requests by response status", self._requests, "status")
+            self._render_counter(lines, p + "_errors_total",
+                                 "API requests that raised, by exception class", self._errors, "error")
+            self._render_counter(lines, p + "_cache_total",
+                                 "Response cache outcomes", self._cache, "outcome")
+            self._render_counter(lines, p + "_wire_bytes_total",
+                                 "Response bytes received over the network", self._wire_bytes)
+            self._render_counter(lines, p + "_decoded_bytes_total",
+                                 "Response bytes after decompression", self._decoded_bytes)
+
+        return '\n'.join(lines) + '\n'
+
+
+class statsd_exporter(_exporter):
+    """ Sends timings and counters for every request to a statsd daemon over
+    UDP as they happen, named like steamodd.ISteamUser.GetPlayerSummaries.duration.
+    Sending is fire and forget, a missing daemon never fails a request. """
+
+    def __init__(self, host="127.0.0.1", port=8125, prefix="steamodd"):
+        self._address = (host, port)
+        self._prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _name(self, details, *parts):
+        endpoint = (details["interface"] or details["tag"] or "other",
+                    details["method"] or "request")
+        return '.'.join((self._prefix,) + endpoint + parts)
+
+    def lines(self, event, details):
+        """ Returns the statsd lines for the given hook event """
+        if event == "request_end":
+            lines = ["{0}:{1:.3f}|ms".format(self._name(details, "duration"), details["duration"] * 1000),
+                     "{0}:1|c".format(self._name(details, "status", str(details["status"] or "none"))),
+                     "{0}:{1}|c".format(self._name(details, "wire_bytes"), details["wire_bytes"]),
+                     "{0}:{1}|c".format(self._name(details, "decoded_bytes"), details["decoded_bytes"])]
+            if details["error"]:
+                lines.append("{0}:1|c".format(self._name(details, "errors", details["error"])))
+            if details["cache"]:
+                lines.append("{0}:1|c".format(self._name(details, "cache", details["cache"])))
+            return lines
+        elif event == "decode":
+            return ["{0}:{1:.3f}|ms".format(self._name(details, "decode"), details["decode_time"] * 1000)]
+
+        return []
+
+    def __call__(self, event, details):
+        lines = self.lines(event, details)
+
+        if lines:
+            try:
+                self._socket.sendto('\n'.join(lines).encode("utf-8"), self._address)
+            except socket.error:
+                pass
+
+    def close(self):
+        self.uninstall()
+        self._socket.close()
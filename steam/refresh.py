@@ -0,0 +1,190 @@
+"""
+Background refreshing of frequently read resources
+Copyright (c) 2010+, Anthony Garcia <anthony@lagg.me>
+Distributed under the ISC License (see LICENSE)
+"""
+
+import time
+import threading
+
+from . import api
+from . import cache
+
+
+class _resource(object):
+    def __init__(self, factory, args, kwargs, ttl, warm):
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+        self.ttl = ttl
+        self.warm = warm
+        self.value = None
+        self.loaded = None
+        self.due = 0
+        self.error = None
+        self.lock = threading.Lock()
+
+
+class refresher(object):
+    """ Keeps objects built by registered factories loaded and replaces them
+    with fresh copies shortly before they go stale, so readers never wait
+    for a download. For example:
+
+        resources = refresher().start()
+        resources.register("schema", items.schema, 440, ttl=3600, warm=len)
+        resources["schema"]
+
+    Refreshes are conditional requests against the installed response cache
+    (a private memory_cache otherwise), so an unchanged resource costs a 304.
+    They happen when 'early' (a fraction of the TTL) is left, and failed ones
+    keep the current copy and are tried again after 'retry' seconds. """
+
+    def __init__(self, early=0.1, retry=30, store=None):
+        self._early = early
+        self._retry = retry
+        self._store = store if store is not None else cache.memory_cache()
+        self._resources = {}
+        self._lock = threading.Lock()
+        self._stats = {"refreshes": 0, "failures": 0}
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+
+    def register(self, name, factory, *args, **kwargs):
+        """ Registers factory(*args, **kwargs) (e.g. items.schema, 440) under
+        name. 'ttl' is how long copies are good for in seconds, 3600 by
+        default. 'warm' is called with new copies before they replace the old
+        ones, to do lazy work like parsing up front. """
+        ttl = kwargs.pop("ttl", 3600)
+        warm = kwargs.pop("warm", None)
+
+        with self._lock:
+            self._resources[name] = _resource(factory, args, kwargs, ttl, warm)
+
+        self._wakeup.set()
+
+    def unregister(self, name):
+        with self._lock:
+            self._resources.pop(name, None)
+
+    def get(self, name):
+        """ Returns the current copy of the named resource, loading it first
+        if the background refresh hasn't yet """
+        res = self._resources[name]
+
+        if res.value is None:
+            with res.lock:
+                if res.value is None:
+                    self._refresh(res)
+                if res.value is None:
+                    raise res.error
+
+        return res.value
+
+    __getitem__ = get
+
+    def refresh(self, name):
+        """ Refreshes the named resource now, raising if that fails """
+        res = self._resources[name]
+
+        with res.lock:
+            if not self._refresh(res):
+                raise res.error
+
+    def _build(self, res):
+        value = res.factory(*res.args, **res.kwargs)
+
+        for fetch in api._fetchers(value):
+            fetch()
+
+        if res.warm:
+            res.warm(value)
+
+        return value
+
+    def _refresh(self, res):
+        store = None if api.response_cache.get() is not None else self._store
+
+        try:
+            if res.value is None and store is None:
+                # The installed cache may well have a fresh copy already
+                value = self._build(res)
+            else:
+                with api.revalidating(store):
+                    value = self._build(res)
+        except Exception as E:
+            res.error = E
+            res.due = time.time() + self._retry
+            self._count("failures")
+            return False
+
+        now = time.time()
+        res.value = value
+        res.error = None
+        res.loaded = now
+        res.due = now + res.ttl * (1 - self._early)
+        self._count("refreshes")
+
+        return True
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def run_pending(self):
+        """ Refreshes whatever is due, returns the seconds until the next
+        refresh or None if nothing is registered """
+        with self._lock:
+            resources = list(self._resources.values())
+
+        for res in resources:
+            if res.due <= time.time():
+                with res.lock:
+                    if res.due <= time.time():
+                        self._refresh(res)
+
+        if not resources:
+            return None
+
+        return max(0, min(res.due for res in resources) - time.time())
+
+    def start(self):
+        """ Starts refreshing in a daemon thread """
+        if not self._thread or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._loop, name="steamodd-refresher")
+            self._thread.daemon = True
+            self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        while not self._stopped:
+            self._wakeup.wait(self.run_pending())
+            self._wakeup.clear()
+
+    async def run(self):
+        """ Refreshes from an asyncio task instead of a thread, e.g.
+        asyncio.create_task(resources.run()). The downloads themselves run
+        in the loop's default executor. Cancel the task to stop. """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            wait = await loop.run_in_executor(None, self.run_pending)
+            await asyncio.sleep(1 if wait is None else wait)
+
+    @property
+    def stats(self):
+        """ Successful and failed loads and refreshes """
+        with self._lock:
+            return dict(self._stats)
@@ -57,4 +57,5 @@ class ugc_file(object):
 
     def __init__(self, appid, ugcid64, **kwargs):
         self._cache = {}
-        self._api = api.interface("ISteamRemoteStorage").GetUGCFileDetails(ugcid=ugcid64, appid=appid, **kwargs)
+        with api.tagged("remote_storage.ugc_file"):
+            self._api = api.interface("ISteamRemoteStorage").GetUGCFileDetails(ugcid=ugcid64, appid=appid, **kwargs)
@@ -23,17 +23,24 @@ class inventory_context(object):
         if self._cache:
             return self._cache
 
-        try:
-            data = self._downloader.download()
-            contexts = re.search("var g_rgAppContextData = (.+);",
-                                 data.decode("utf-8"))
-            match = contexts.group(1)
-            self._cache = json.loads(match)
-        except:
-            raise items.InventoryError("No SIM inventory information available for this user")
+        with self._lock:
+            if self._cache:
+                return self._cache
+
+            try:
+                data = self._downloader.download()
+                contexts = re.search("var g_rgAppContextData = (.+);",
+                                     data.decode("utf-8"))
+                match = contexts.group(1)
+                self._cache = json.loads(match)
+            except:
+                raise items.InventoryError("No SIM inventory information available for this user")
 
         return self._cache
 
+    def _prefetch(self):
+        self.ctx
+
     def get(self, key):
         """ Returns context data for a given app, can be an ID or a case insensitive name """
         keystr = str(key)
@@ -77,12 +84,14 @@ class inventory_context(object):
 
     def __init__(self, user, **kwargs):
         self._cache = {}
+        self._lock = api._fetch_lock()
         try:
             sid = user.id64
         except:
             sid = user
 
-        self._downloader = api.http_downloader("http://steamcommunity.com/profiles/{0}/inventory/".format(sid), **kwargs)
+        with api.tagged("sim.inventory_context"):
+            self._downloader = api.http_downloader("http://steamcommunity.com/profiles/{0}/inventory/".format(sid), **kwargs)
         self._user = sid
 
 
@@ -125,11 +134,21 @@ class inventory(object):
     def __len__(self):
         return len(self._inv.get("items", []))
 
+    def _prefetch(self):
+        self._inv
+
     @property
     def _inv(self):
         if self._cache:
             return self._cache
 
+        with self._lock:
+            if not self._cache:
+                self._cache = self._load_inv()
+
+        return self._cache
+
+    def _load_inv(self):
         invstr = "http://steamcommunity.com/inventory/{0}/{1}/{2}"
         page_url = invstr.format(self._user, self._app, self._section)
         page_url_args = {}
@@ -145,8 +164,9 @@ class inventory(object):
 
         page_url += "?" + urlencode(page_url_args)
 
-        req = api.http_downloader(page_url, timeout=self._timeout)
-        inventorysection = json.loads(req.download().decode("utf-8"))
+        with api.tagged("sim.inventory"), api.deadline(self._deadline):
+            req = api.http_downloader(page_url, timeout=self._timeout)
+        inventorysection = api.decode_json(req.download())
 
         if not inventorysection:
             raise items.InventoryError("Empty context data returned")
@@ -169,7 +189,7 @@ class inventory(object):
         for item in inv:
             items[item["assetid"]] = item
 
-        self._cache = {
+        return {
                 "classes": descs,
                 "items": items,
                 "app": self._app,
@@ -179,23 +199,26 @@ class inventory(object):
                 "last_assetid": inventorysection.get("last_assetid")
         }
 
-        return self._cache
-
-    def __init__(self, profile, app, section, page_start=None, page_size=2000, timeout=None, lang=None):
+    def __init__(self, profile, app, section, page_start=None, page_size=2000, timeout=None, lang=None,
+                 deadline=None):
         """
         'profile': User ID or user object
         'app': Steam app to get the inventory for
         'section': Inventory section to operatoe on
         'page_start': Asset ID to use as first item in inv chunk
         'page_size': How many assets should be in a page
+        'deadline': Seconds the page may take to load, counted from when it starts loading.
+        To give several pages one budget load them inside 'with api.deadline(...)'
         """
 
         self._app = app
         self._cache = {}
+        self._lock = api._fetch_lock()
         self._page_size = page_size
         self._page_start = page_start
         self._section = section
         self._timeout = timeout or api.socket_timeout.get()
+        self._deadline = deadline
         self._language = loc.language(lang).name.lower()
 
         if not app:
@@ -60,7 +60,8 @@ class vanity_url(object):
         vanity = os.path.basename(str(vanity).strip('/'))
 
         self._cache = None
-        self._api = api.interface("ISteamUser").ResolveVanityURL(vanityurl=vanity, **kwargs)
+        with api.tagged("user.vanity_url"):
+            self._api = api.interface("ISteamUser").ResolveVanityURL(vanityurl=vanity, **kwargs)
 
 
 class profile(object):
@@ -221,6 +222,9 @@ class profile(object):
 
         return self._cache
 
+    def _prefetch(self):
+        self._prof
+
     @property
     def level(self):
         """
@@ -230,17 +234,22 @@ class profile(object):
         as a separate class. You won't need this output and not the profile output
         """
 
-        level_key = "player_level"
+        # Kept apart from the summary so that profiles built by from_def
+        # don't fetch their own summary just to look for it
+        if self._level is not None:
+            return self._level
 
-        if level_key in self._api["response"]:
-            return self._api["response"][level_key]
+        with self._lock:
+            if self._level is not None:
+                return self._level
 
-        try:
-            lvl = api.interface("IPlayerService").GetSteamLevel(steamid=self.id64)["response"][level_key]
-            self._api["response"][level_key] = lvl
-            return lvl
-        except:
-            return -1
+            try:
+                with api.tagged("user.profile"):
+                    lvl = api.interface("IPlayerService").GetSteamLevel(steamid=self.id64)["response"]["player_level"]
+                self._level = lvl
+                return lvl
+            except:
+                return -1
 
     @classmethod
     def from_def(cls, obj):
@@ -261,7 +270,10 @@ class profile(object):
             sid = os.path.basename(str(sid).strip('/'))
 
         self._cache = {}
-        self._api = api.interface("ISteamUser").GetPlayerSummaries(version=2, steamids=sid, **kwargs)
+        self._level = None
+        self._lock = api._fetch_lock()
+        with api.tagged("user.profile"):
+            self._api = api.interface("ISteamUser").GetPlayerSummaries(version=2, steamids=sid, **kwargs)
 
 
 class _batched_request(object):
@@ -269,8 +281,9 @@ class _batched_request(object):
     per request (for example GetPlayerSummaries takes multiple id64s)
     """
 
-    def __init__(self, batch, batchsize=100):
+    def __init__(self, batch, batchsize=100, deadline=None):
         self._batches = []
+        self._deadline = deadline
         batchlen, rem = divmod(len(batch), batchsize)
 
         if rem > 0:
@@ -298,22 +311,30 @@ class _batched_request(object):
         return next(self)
 
     def __next__(self):
+        # One budget for all of the batches, starting with the first
+        budget = api.deadline(self._deadline)
+
         for batch in self._batches:
-            for result in self._call_method(batch):
+            with budget:
+                results = self._call_method(batch)
+            for result in results:
                 yield result
     next = __next__
 
 
 class profile_batch(_batched_request):
-    def __init__(self, sids):
+    def __init__(self, sids, deadline=None):
         """ Fetches user profiles en masse and generates 'profile' objects.
         The length of the ID list can be indefinite, separate requests
         will be made if the length exceeds the API's ID cap and the list
-        split into batches. """
-        super(profile_batch, self).__init__(sids)
+        split into batches. deadline caps the seconds all of them may take. """
+        super(profile_batch, self).__init__(sids, deadline=deadline)
 
     def _process_batch(self, batch):
-        processed = set()
+        # Kept in order so the same IDs always make the same URL, which
+        # caches and recordings depend on
+        processed = []
+        seen = set()
 
         for sid in batch:
             try:
@@ -321,12 +342,16 @@ class profile_batch(_batched_request):
             except AttributeError:
                 sid = os.path.basename(str(sid).strip('/'))
 
-            processed.add(str(sid))
+            sid = str(sid)
+            if sid not in seen:
+                seen.add(sid)
+                processed.append(sid)
 
         return processed
 
     def _call_method(self, batch):
-        response = api.interface("ISteamUser").GetPlayerSummaries(version=2, steamids=','.join(batch))
+        with api.tagged("user.profile_batch"):
+            response = api.interface("ISteamUser").GetPlayerSummaries(version=2, steamids=','.join(batch))
 
         return [profile.from_def(player) for player in response["response"]["players"]]
 
@@ -339,7 +364,8 @@ class bans(object):
             sid = os.path.basename(str(sid).strip('/'))
 
         self._cache = {}
-        self._api = api.interface("ISteamUser").GetPlayerBans(steamids=sid, **kwargs)
+        with api.tagged("user.bans"):
+            self._api = api.interface("ISteamUser").GetPlayerBans(steamids=sid, **kwargs)
 
     @property
     def _bans(self):
@@ -355,6 +381,9 @@ class bans(object):
 
         return self._cache
 
+    def _prefetch(self):
+        self._bans
+
     @property
     def id64(self):
         return int(self._bans["SteamId"])
@@ -401,11 +430,14 @@ class bans(object):
 
 
 class bans_batch(_batched_request):
-    def __init__(self, sids):
-        super(bans_batch, self).__init__(sids)
+    def __init__(self, sids, deadline=None):
+        super(bans_batch, self).__init__(sids, deadline=deadline)
 
     def _process_batch(self, batch):
-        processed = set()
+        # Kept in order so the same IDs always make the same URL, which
+        # caches and recordings depend on
+        processed = []
+        seen = set()
 
         for sid in batch:
             try:
@@ -413,12 +445,16 @@ class bans_batch(_batched_request):
             except AttributeError:
                 sid = os.path.basename(str(sid).strip('/'))
 
-            processed.add(str(sid))
+            sid = str(sid)
+            if sid not in seen:
+                seen.add(sid)
+                processed.append(sid)
 
         return processed
 
     def _call_method(self, batch):
-        response = api.interface("ISteamUser").GetPlayerBans(steamids=','.join(batch))
+        with api.tagged("user.bans_batch"):
+            response = api.interface("ISteamUser").GetPlayerBans(steamids=','.join(batch))
 
         return [bans.from_def(player) for player in response["players"]]
 
@@ -459,9 +495,10 @@ class friend_list(object):
         except AttributeError:
             sid = os.path.basename(str(sid).strip('/'))
 
-        self._api = api.interface("ISteamUser").GetFriendList(steamid=sid,
-                                                              relationship=relationship,
-                                                              **kwargs)
+        with api.tagged("user.friend_list"):
+            self._api = api.interface("ISteamUser").GetFriendList(steamid=sid,
+                                                                  relationship=relationship,
+                                                                  **kwargs)
         try:
             self._friends = self._api["friendslist"]["friends"]
         except api.HTTPFileNotFoundError:
@@ -0,0 +1,1489 @@
+import unittest
+import os
+import sys
+import subprocess
+import asyncio
+import socket
+import threading
+import time
+import gzip
+import zlib
+import shutil
+import tempfile
+import json
+import pickle
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from steam import api
+from steam import apps
+from steam import cache
+from steam import items
+from steam import metrics
+from steam import refresh
+from steam import sim
+from steam import user
+
+
+class _server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        route = self.server.routes.get(self.path.split('?')[0])
+        self.server.requests.append((self.path, dict(self.headers.items()), self.client_address))
+
+        if route:
+            code, headers, body = route(self)
+        else:
+            code, headers, body = 404, {}, b"not found"
+
+        self.send_response(code)
+        for k, v in headers.items():
+            self.send_header(k, v)
+
+        if headers.get("Transfer-Encoding") == "chunked":
+            self.end_headers()
+            for i in range(0, len(body), 7):
+                chunk = body[i:i + 7]
+                self.wfile.write("{0:x}\r\n".format(len(chunk)).encode("ascii") + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def handle_one_request(self):
+        try:
+            BaseHTTPRequestHandler.handle_one_request(self)
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients that gave up (timeout tests) aren't errors
+            self.close_connection = True
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._respond()
+
+    def do_CONNECT(self):
+        self._respond()
+        self.close_connection = True
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """ Runs a local HTTP/1.1 server so the api layer can be tested offline """
+
+    def setUp(self):
+        self.server = _server(("127.0.0.1", 0), _handler)
+        self.server.routes = {}
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.pool = api.connection_pool()
+        api.http_pool.set(self.pool)
+
+    def tearDown(self):
+        api.http_pool.set(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        return "http://127.0.0.1:{0}{1}".format(self.server.server_address[1], path)
+
+    def route(self, path, code=200, headers={}, body=b'{"result": {"status": 1}}'):
+        self.server.routes[path] = lambda handler: (code, headers, body)
+
+
+class ConnectionPoolTestCase(LocalServerTestCase):
+    def test_connection_reuse(self):
+        self.route("/a")
+        self.route("/b")
+
+        for path in ("/a", "/b", "/a"):
+            api.http_downloader(self.url(path)).download()
+
+        clients = set(req[2] for req in self.server.requests)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(clients), 1)
+        self.assertEqual(self.pool.idle_count, 1)
+
+    def test_idle_eviction(self):
+        self.route("/a")
+        api.http_pool.set(api.connection_pool(idle_timeout=-1))
+
+        api.http_downloader(self.url("/a")).download()
+        self.assertEqual(api.http_pool.get().evict_idle(), 1)
+
+        api.http_downloader(self.url("/a")).download()
+        clients = set(req[2] for req in self.server.requests)
+        self.assertEqual(len(clients), 2)
+
+    def test_pool_size(self):
+        self.route("/a")
+        pool = api.connection_pool(maxsize=0)
+        api.http_pool.set(pool)
+
+        api.http_downloader(self.url("/a")).download()
+        self.assertEqual(pool.idle_count, 0)
+
+    def test_redirect(self):
+        self.route("/old", code=301, headers={"Location": "/new"}, body=b'')
+        self.route("/new", body=b'{"moved": true}')
+
+        res = api.method_result(self.url("/old"))
+        self.assertEqual(res["moved"], True)
+        self.assertEqual(len(set(req[2] for req in self.server.requests)), 1)
+
+    def test_post(self):
+        self.server.routes["/post"] = lambda handler: (200, {}, handler.body)
+
+        body = api.http_downloader(self.url("/post"), data={"a": 1}).download()
+        self.assertEqual(body, b"a=1")
+
+    def test_status_errors(self):
+        self.route("/stale", code=304, body=b'')
+        self.route("/broken", code=500)
+        self.route("/other", code=403)
+
+        self.assertRaises(api.HTTPFileNotFoundError, api.http_downloader(self.url("/missing")).download)
+        self.assertRaises(api.HTTPStale, api.http_downloader(self.url("/stale"), last_modified="x").download)
+        self.assertRaises(api.HTTPInternalServerError, api.http_downloader(self.url("/broken")).download)
+        self.assertRaises(api.HTTPError, api.http_downloader(self.url("/other")).download)
+
+        # Error responses shouldn't poison the pool
+        self.route("/ok")
+        api.http_downloader(self.url("/ok")).download()
+        self.assertEqual(len(set(req[2] for req in self.server.requests)), 1)
+
+    def test_connection_refused(self):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        url = "http://127.0.0.1:{0}/".format(sock.getsockname()[1])
+        sock.close()
+
+        self.assertRaises(api.HTTPTimeoutError, api.http_downloader(url).download)
+
+
+class ProxyTestCase(LocalServerTestCase):
+    """ The local server stands in for the proxy """
+
+    def test_http_proxy(self):
+        self.route("http://example.invalid/a")
+        pool = api.connection_pool(proxies={"http": "user:p%40ss@" + self.url("")[len("http://"):]})
+        api.http_pool.set(pool)
+
+        for i in range(2):
+            api.http_downloader("http://example.invalid/a").download()
+
+        path, headers, client = self.server.requests[-1]
+        self.assertEqual(path, "http://example.invalid/a")
+        self.assertEqual(headers["Proxy-Authorization"], "Basic dXNlcjpwQHNz")
+        self.assertEqual(len(set(req[2] for req in self.server.requests)), 1)
+
+    def test_no_proxy(self):
+        self.route("/a")
+        api.http_pool.set(api.connection_pool(proxies={"http": "http://proxy.invalid:3128",
+                                                       "no": "127.0.0.1"}))
+
+        api.http_downloader(self.url("/a")).download()
+        self.assertEqual(self.server.requests[0][0], "/a")
+
+    def test_https_tunnel(self):
+        api.http_pool.set(api.connection_pool(proxies={"https": self.url("")}))
+
+        self.assertRaises(api.HTTPError, api.http_downloader("https://example.invalid/a").download)
+        self.assertEqual(self.server.requests[0][0], "example.invalid:443")
+
+    def test_environment(self):
+        self.route("http://example.invalid/a")
+
+        saved = dict(os.environ)
+        os.environ["http_proxy"] = self.url("")
+        os.environ.pop("no_proxy", None)
+
+        async def fetch():
+            return await api.async_http_downloader("http://example.invalid/a").download()
+
+        try:
+            api.http_downloader("http://example.invalid/a").download()
+            asyncio.run(fetch())
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+
+        self.assertEqual([req[0] for req in self.server.requests], ["http://example.invalid/a"] * 2)
+
+
+class AsyncInterfaceTestCase(LocalServerTestCase):
+    def test_same_payload(self):
+        self.route("/a", body=b'{"response": {"players": [1, 2]}}')
+
+        async def fetch():
+            res = api.async_method_result(self.url("/a"))
+            await res.call()
+            return res
+
+        res = asyncio.run(fetch())
+        self.assertEqual(res, api.method_result(self.url("/a"), aggressive=True))
+        self.assertEqual(res["response"]["players"], [1, 2])
+
+    def test_unfetched(self):
+        self.route("/a")
+        res = api.async_method_result(self.url("/a"))
+
+        self.assertRaises(api.APIError, res.__getitem__, "result")
+        self.assertRaises(api.APIError, pickle.loads(pickle.dumps(res)).__len__)
+        self.assertIsInstance(api.fetch_all([res])[0], api.APIError)
+        self.assertEqual(self.server.requests, [])
+
+        asyncio.run(res.call())
+        self.assertEqual(res["result"]["status"], 1)
+
+    def test_concurrent(self):
+        self.route("/chunked", headers={"Transfer-Encoding": "chunked"},
+                   body=b'{"result": {"items": [1, 2, 3, 4, 5]}}')
+
+        async def fetch():
+            results = [api.async_method_result(self.url("/chunked")) for i in range(20)]
+            await asyncio.gather(*[res.call() for res in results])
+            return results
+
+        for res in asyncio.run(fetch()):
+            self.assertEqual(res["result"]["items"], [1, 2, 3, 4, 5])
+
+    def test_errors(self):
+        self.route("/stale", code=304, body=b'')
+        self.route("/redirect", code=302, headers={"Location": "/missing"}, body=b'')
+        self.server.routes["/slow"] = lambda handler: time.sleep(0.5) or (200, {}, b'{}')
+
+        async def fetch(path, **kwargs):
+            await api.async_method_result(self.url(path), **kwargs).call()
+
+        self.assertRaises(api.HTTPFileNotFoundError, asyncio.run, fetch("/redirect"))
+        self.assertRaises(api.HTTPStale, asyncio.run, fetch("/stale", last_modified="x"))
+        self.assertRaises(api.HTTPTimeoutError, asyncio.run, fetch("/slow", timeout=0.1))
+
+    def test_interface(self):
+        api.key.set("testkey")
+        method = api.async_interface("ISteamUser").GetPlayerSummaries
+        self.assertTrue(asyncio.iscoroutinefunction(method.__call__))
+        self.assertIn("key=testkey", method._build_url(2, {"steamids": 1}))
+
+
+class CompressionTestCase(LocalServerTestCase):
+    PAYLOAD = b'{"result": {"items": [' + b','.join([b'{"defindex": 1, "name": "Bottle"}'] * 500) + b']}}'
+
+    def setUp(self):
+        super(CompressionTestCase, self).setUp()
+        raw = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.route("/gzip", headers={"Content-Encoding": "gzip"}, body=gzip.compress(self.PAYLOAD))
+        self.route("/deflate", headers={"Content-Encoding": "deflate"}, body=zlib.compress(self.PAYLOAD))
+        self.route("/rawdeflate", headers={"Content-Encoding": "deflate", "Transfer-Encoding": "chunked"},
+                   body=raw.compress(self.PAYLOAD) + raw.flush())
+        self.route("/plain", body=self.PAYLOAD)
+
+    def test_negotiation(self):
+        api.http_downloader(self.url("/plain")).download()
+        self.assertIn("gzip", self.server.requests[0][1]["Accept-Encoding"])
+
+    def test_decode(self):
+        for path in ("/gzip", "/deflate", "/rawdeflate"):
+            res = api.method_result(self.url(path))
+            self.assertEqual(len(res["result"]["items"]), 500)
+            self.assertEqual(res.decoded_bytes, len(self.PAYLOAD))
+            self.assertLess(res.wire_bytes * 10, res.decoded_bytes)
+
+        res = api.method_result(self.url("/plain"), aggressive=True)
+        self.assertEqual(res.wire_bytes, res.decoded_bytes)
+
+    def test_async_decode(self):
+        async def fetch(path):
+            res = api.async_method_result(self.url(path))
+            await res.call()
+            return res
+
+        for path in ("/gzip", "/rawdeflate"):
+            res = asyncio.run(fetch(path))
+            self.assertEqual(len(res["result"]["items"]), 500)
+            self.assertEqual(res.decoded_bytes, len(self.PAYLOAD))
+
+    def test_corrupt(self):
+        self.route("/corrupt", headers={"Content-Encoding": "gzip"}, body=b"not gzip at all")
+        self.assertRaises(api.HTTPError, api.http_downloader(self.url("/corrupt")).download)
+
+
+class ResponseCacheTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(ResponseCacheTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.body = b'{"result": {"items_game_url": "a"}}'
+        self.server.routes["/schema"] = self._conditional
+        api.response_cache.set(cache.disk_cache(self.path))
+
+    def tearDown(self):
+        api.response_cache.set(None)
+        shutil.rmtree(self.path)
+        super(ResponseCacheTestCase, self).tearDown()
+
+    def _conditional(self, handler):
+        headers = {"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT", "ETag": '"v1"'}
+
+        if handler.headers.get("If-None-Match") == '"v1"':
+            return 304, headers, b''
+
+        return 200, headers, self.body
+
+    def test_revalidation(self):
+        first = api.method_result(self.url("/schema?key=one&language=en"), aggressive=True)
+        # A different API key and argument order is the same resource
+        second = api.method_result(self.url("/schema?language=en&key=two"), aggressive=True)
+
+        self.assertEqual(first, second)
+        self.assertEqual(second.wire_bytes, 0)
+        self.assertEqual(self.server.requests[1][1]["If-None-Match"], '"v1"')
+        self.assertEqual(self.server.requests[1][1]["If-Modified-Since"], "Mon, 01 Jan 2024 00:00:00 GMT")
+
+    def test_async_revalidation(self):
+        async def fetch():
+            res = api.async_method_result(self.url("/schema"))
+            await res.call()
+            return res
+
+        api.method_result(self.url("/schema"), aggressive=True)
+        self.assertEqual(asyncio.run(fetch())["result"]["items_game_url"], "a")
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_explicit_since(self):
+        api.method_result(self.url("/schema"), aggressive=True)
+        downloader = api.http_downloader(self.url("/schema"), last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+        self.assertNotIn("If-None-Match", downloader._build_headers())
+
+
+class ETagTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(ETagTestCase, self).setUp()
+        self.server.routes["/IFoo/Bar/v1"] = self._etagged
+
+    def _etagged(self, handler):
+        if handler.headers.get("If-None-Match") == '"v2"':
+            return 304, {"ETag": '"v2"'}, b''
+
+        return 200, {"ETag": '"v2"'}, b'{"a": 1}'
+
+    def test_etag(self):
+        res = api.method_result(self.url("/IFoo/Bar/v1"), aggressive=True)
+        self.assertEqual(res.etag, '"v2"')
+        self.assertIsNone(res.last_modified)
+
+        polled = api.method_result(self.url("/IFoo/Bar/v1"), etag=res.etag)
+        self.assertRaises(api.HTTPStale, polled.call)
+        self.assertEqual(self.server.requests[1][1]["If-None-Match"], '"v2"')
+        self.assertNotIn("If-Modified-Since", self.server.requests[1][1])
+
+        changed = api.http_downloader(self.url("/IFoo/Bar/v1"), etag='"v1"')
+        self.assertEqual(changed.download(), b'{"a": 1}')
+        self.assertEqual(changed.etag, '"v2"')
+
+    def test_interface(self):
+        iface = api.interface("IFoo")
+        iface_method = iface.Bar
+        iface_method._build_url = lambda version, kwargs: self.url("/IFoo/Bar/v1")
+        self.assertRaises(api.HTTPStale, iface_method(etag='"v2"').call)
+
+        async_method = api.async_interface("IFoo").Bar
+        async_method._build_url = iface_method._build_url
+        self.assertRaises(api.HTTPStale, asyncio.run, async_method(etag='"v2"'))
+
+
+class MemoryCacheTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(MemoryCacheTestCase, self).setUp()
+        self.store = cache.memory_cache(policies={"IEconItems_440": 3600})
+        self.route("/IEconItems_440/GetSchemaOverview/v1")
+        self.route("/ISteamUser/GetPlayerSummaries/v2")
+        api.response_cache.set(self.store)
+
+    def tearDown(self):
+        api.response_cache.set(None)
+        super(MemoryCacheTestCase, self).tearDown()
+
+    def test_ttl(self):
+        for i in range(3):
+            api.method_result(self.url("/IEconItems_440/GetSchemaOverview/v1?key=a"), aggressive=True)
+            api.method_result(self.url("/ISteamUser/GetPlayerSummaries/v2?key=a"), aggressive=True)
+
+        # Summaries have no TTL so they're refetched every time
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(self.store.stats["hits"], 2)
+        self.assertEqual(self.store.stats["misses"], 4)
+
+
+class CoalescingTestCase(LocalServerTestCase):
+    def _concurrent(self, downloaders):
+        results = [None] * len(downloaders)
+        barrier = threading.Barrier(len(downloaders))
+
+        def run(i):
+            barrier.wait()
+            try:
+                results[i] = downloaders[i].download()
+            except Exception as E:
+                results[i] = E
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(downloaders))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_shared_download(self):
+        self.server.routes["/schema"] = lambda handler: time.sleep(0.3) or (200, {}, b'{"a": 1}')
+
+        results = self._concurrent([api.http_downloader(self.url("/schema")) for i in range(10)])
+        self.assertEqual(results, [b'{"a": 1}'] * 10)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(len(api.request_coalescing._flights), 0)
+
+    def test_shared_error(self):
+        self.server.routes["/broken"] = lambda handler: time.sleep(0.3) or (500, {}, b'')
+
+        results = self._concurrent([api.http_downloader(self.url("/broken")) for i in range(5)])
+        self.assertTrue(all(isinstance(res, api.HTTPInternalServerError) for res in results))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_distinct_requests(self):
+        self.server.routes["/post"] = lambda handler: time.sleep(0.3) or (200, {}, handler.body)
+
+        results = self._concurrent([api.http_downloader(self.url("/post"), data={"a": i % 2}) for i in range(4)])
+        self.assertEqual(sorted(results), [b"a=0", b"a=0", b"a=1", b"a=1"])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_disabled(self):
+        self.server.routes["/schema"] = lambda handler: time.sleep(0.3) or (200, {}, b'{}')
+        api.request_coalescing.set(False)
+
+        try:
+            self._concurrent([api.http_downloader(self.url("/schema")) for i in range(3)])
+        finally:
+            api.request_coalescing.set(True)
+
+        self.assertEqual(len(self.server.requests), 3)
+
+
+class RateLimiterTestCase(LocalServerTestCase):
+    def tearDown(self):
+        api.rate_limiter.set(None)
+        super(RateLimiterTestCase, self).tearDown()
+
+    def test_bucket(self):
+        limiter = api.token_bucket_limiter(rate=10, burst=2)
+
+        self.assertEqual(limiter.reserve("host", "a"), 0)
+        self.assertEqual(limiter.reserve("host", "a"), 0)
+        self.assertAlmostEqual(limiter.reserve("host", "a"), 0.1, places=2)
+        # Keys get separate budgets
+        self.assertEqual(limiter.reserve("host", "b"), 0)
+        self.assertEqual(limiter.stats["waits"], 1)
+
+    def test_adaptive(self):
+        limiter = api.token_bucket_limiter(rate=10, burst=100, recovery=0.5)
+
+        limiter.throttled("host", "a", retry_after=5)
+        self.assertEqual(limiter.rate("host", "a"), 5)
+        self.assertGreater(limiter.reserve("host", "a"), 4.9)
+
+        limiter.succeeded("host", "a")
+        self.assertEqual(limiter.rate("host", "a"), 10)
+
+    def test_throttled_response(self):
+        self.route("/limited", code=429, headers={"Retry-After": "2"})
+        self.route("/ok")
+        limiter = api.token_bucket_limiter(rate=1000, burst=1000)
+        api.rate_limiter.set(limiter)
+
+        try:
+            api.http_downloader(self.url("/limited?key=a")).download()
+            self.fail("429 not raised")
+        except api.HTTPTooManyRequestsError as E:
+            self.assertEqual(E.retry_after, 2)
+
+        self.assertEqual(limiter.stats["throttled"], 1)
+        self.assertGreater(limiter.reserve("127.0.0.1", "a"), 1.9)
+        self.assertEqual(limiter.reserve("127.0.0.1", "b"), 0)
+
+    def test_waiting(self):
+        self.route("/ok")
+        api.rate_limiter.set(api.token_bucket_limiter(rate=20, burst=1))
+
+        start = time.time()
+        for i in range(3):
+            api.http_downloader(self.url("/ok")).download()
+
+        self.assertGreater(time.time() - start, 0.09)
+        self.assertEqual(api.rate_limiter.get().queue_depth, 0)
+        self.assertEqual(api.rate_limiter.get().stats["waits"], 2)
+
+
+class RetryPolicyTestCase(LocalServerTestCase):
+    def tearDown(self):
+        api.retries.set(None)
+        super(RetryPolicyTestCase, self).tearDown()
+
+    def _flaky(self, failures, error=api.HTTPTimeoutError):
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise error("flaky")
+            return len(calls)
+
+        return func
+
+    def test_retries(self):
+        policy = api.retry_policy(max_attempts=3, backoff=0.01)
+        self.assertEqual(policy.run(self._flaky(2)), 3)
+        self.assertRaises(api.HTTPTimeoutError, policy.run, self._flaky(3))
+        self.assertEqual(policy.stats, {"calls": 2, "retries": 4, "gave_up": 1})
+
+    def test_classification(self):
+        policy = api.retry_policy(max_attempts=5, backoff=0.01)
+        func = self._flaky(1, api.HTTPFileNotFoundError)
+        self.assertRaises(api.HTTPFileNotFoundError, policy.run, func)
+        self.assertEqual(policy.stats["retries"], 0)
+
+        policy = api.retry_policy(max_attempts=5, backoff=0.01, retry_on=(api.HTTPFileNotFoundError,))
+        self.assertEqual(policy.run(self._flaky(1, api.HTTPFileNotFoundError)), 2)
+
+    def test_deadline(self):
+        policy = api.retry_policy(max_attempts=100, backoff=0.2, max_backoff=0.2, deadline=0.3)
+        start = time.time()
+        self.assertRaises(api.HTTPTimeoutError, policy.run, self._flaky(100))
+        self.assertLess(time.time() - start, 0.3)
+
+    def test_retry_after(self):
+        policy = api.retry_policy(backoff=0)
+        self.assertEqual(policy.delay(api.HTTPTooManyRequestsError("", retry_after=3), 1), 3)
+
+    def test_download(self):
+        attempts = []
+
+        def flaky(handler):
+            attempts.append(1)
+            return (500, {}, b'') if len(attempts) < 3 else (200, {}, b'{"ok": 1}')
+
+        self.server.routes["/flaky"] = flaky
+        api.retries.set(api.retry_policy(max_attempts=3, backoff=0.01))
+
+        self.assertEqual(api.method_result(self.url("/flaky"))["ok"], 1)
+        self.assertEqual(len(attempts), 3)
+
+        attempts[:] = []
+        async def fetch():
+            res = api.async_method_result(self.url("/flaky"))
+            await res.call()
+            return res
+
+        self.assertEqual(asyncio.run(fetch())["ok"], 1)
+
+
+class DecodeJSONTestCase(unittest.TestCase):
+    def _decode_both(self, data):
+        backend = api.orjson
+        try:
+            api.orjson = None
+            stdlib = api.decode_json(data)
+        finally:
+            api.orjson = backend
+
+        self.assertEqual(stdlib, api.decode_json(data))
+        return stdlib
+
+    def test_bytes(self):
+        self.assertEqual(self._decode_both('{"name": "Sch\u00e4del \u2122"}'.encode("utf-8")),
+                         {"name": "Sch\u00e4del \u2122"})
+
+    def test_invalid_utf8(self):
+        self.assertEqual(self._decode_both(b'{"name": "bad \xff byte"}'), {"name": "bad  byte"})
+
+    def test_invalid_json(self):
+        self.assertRaises(ValueError, api.decode_json, b'{"name": ')
+
+
+class StreamTestCase(LocalServerTestCase):
+    DOC = {"applist": {"apps": [{"appid": i, "name": "App \u2122 {0}".format(i)} for i in range(2000)] + [7, 8.5],
+                       "status": 1},
+           "other": [1, {"nested": ["x", "y"]}]}
+
+    def test_chunk_boundaries(self):
+        data = json.dumps(self.DOC).encode("utf-8")
+
+        for size in (1, 2, 5, 1000, len(data)):
+            stream = api.json_stream([data[i:i + size] for i in range(0, len(data), size)], ["applist", "apps"])
+            self.assertEqual(list(stream), self.DOC["applist"]["apps"])
+            self.assertEqual(stream.rest, {"applist": {"apps": [], "status": 1},
+                                           "other": self.DOC["other"]})
+
+    def test_missing_path(self):
+        stream = api.json_stream([b'{"applist": {"status": 1}}'], ["applist", "apps"])
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.rest, {"applist": {"status": 1}})
+
+    def test_truncated(self):
+        stream = api.json_stream([b'{"applist": {"apps": [1, 2'], ["applist", "apps"])
+        self.assertRaises(ValueError, list, stream)
+
+    def test_method_result(self):
+        self.route("/apps", headers={"Content-Encoding": "gzip", "Transfer-Encoding": "chunked"},
+                   body=gzip.compress(json.dumps(self.DOC).encode("utf-8")))
+
+        res = api.method_result(self.url("/apps"))
+        apps = list(res.stream("applist", "apps"))
+        self.assertEqual(apps, self.DOC["applist"]["apps"])
+        self.assertEqual(res["applist"]["status"], 1)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(res.decoded_bytes, len(json.dumps(self.DOC)))
+
+    def test_stream_errors(self):
+        res = api.method_result(self.url("/missing"))
+        self.assertRaises(api.HTTPFileNotFoundError, list, res.stream("applist", "apps"))
+
+
+class TransportTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(TransportTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        api.key.set("testkey")
+
+    def tearDown(self):
+        api.http_transport.set(None)
+        shutil.rmtree(self.path)
+        super(TransportTestCase, self).tearDown()
+
+    def test_urllib(self):
+        self.route("/a", headers={"Content-Encoding": "gzip"}, body=gzip.compress(b'{"a": 1}'))
+        api.http_transport.set(api.urllib_transport())
+
+        self.assertEqual(api.method_result(self.url("/a"))["a"], 1)
+        self.assertRaises(api.HTTPFileNotFoundError, api.http_downloader(self.url("/missing")).download)
+
+    def test_record_replay(self):
+        self.route("/a", headers={"Content-Encoding": "gzip", "ETag": '"1"'}, body=gzip.compress(b'{"a": 1}'))
+        self.route("/gone", code=404)
+
+        api.http_transport.set(api.recording_transport(self.path))
+        recorded = api.method_result(self.url("/a?key=recorder"), aggressive=True)
+        self.assertRaises(api.HTTPFileNotFoundError, api.http_downloader(self.url("/gone")).download)
+
+        self.server.routes.clear()
+        api.http_transport.set(api.replay_transport(self.path, latency=0.05))
+
+        start = time.time()
+        replayed = api.method_result(self.url("/a?key=replayer"), aggressive=True)
+        self.assertEqual(replayed, recorded)
+        self.assertGreater(replayed.decoded_bytes, replayed.wire_bytes - 30)
+        self.assertGreaterEqual(time.time() - start, 0.05)
+        self.assertRaises(api.HTTPFileNotFoundError, api.http_downloader(self.url("/gone")).download)
+        self.assertRaises(api.ReplayMissError, api.http_downloader(self.url("/never")).download)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_high_level(self):
+        replay = api.replay_transport(self.path)
+        api.http_transport.set(replay)
+        base = "https://api.steampowered.com/ISteamApps/GetAppList/v2?format=json"
+        replay.add(base, json.dumps({"applist": {"apps": [{"appid": 440, "name": "Team Fortress 2"},
+                                                           {"appid": 10, "name": "Counter-Strike"}]}}))
+
+        self.assertEqual(apps.app_list()["counter-strike"], (10, "Counter-Strike"))
+        self.assertEqual(sum(1 for app in apps.app_list(stream=True)), 2)
+
+    def test_streamed_app_list(self):
+        replay = api.replay_transport(self.path)
+        api.http_transport.set(replay)
+        base = "https://api.steampowered.com/ISteamApps/GetAppList/v2?format=json"
+        replay.add(base, json.dumps({"applist": {"apps": [{"appid": 440, "name": "Team Fortress 2"}]}}))
+        requests = []
+        hook = lambda event, details: event == "request_end" and requests.append(details["url"])
+        api.hooks.register(hook)
+        self.addCleanup(api.hooks.unregister, hook)
+
+        applist = apps.app_list(stream=True)
+        self.assertRaises(TypeError, len, applist)
+        self.assertEqual(list(applist), [(440, "Team Fortress 2")])
+        self.assertEqual(len(applist), 1)
+        self.assertEqual(len(requests), 1)
+
+        # Malformed lists fail like they do unstreamed
+        replay.add(base, b'{}')
+        self.assertRaises(apps.AppError, list, apps.app_list(stream=True))
+        self.assertRaises(apps.AppError, list, apps.app_list())
+
+    def test_batch_replay(self):
+        sids = ["7656119800000000{0}".format(i) for i in (5, 3, 9, 1, 7, 3)]
+        replay = api.replay_transport(self.path)
+        replay.add("https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2?format=json&steamids="
+                   + ",".join(sids[:5]),
+                   json.dumps({"response": {"players": [{"steamid": sid} for sid in sids[:5]]}}))
+
+        # Recordings made in one process are found again in others, however they hash strings
+        script = ("from steam import api, user; api.key.set('k'); "
+                  "api.http_transport.set(api.replay_transport({0!r})); "
+                  "print(len(list(user.profile_batch({1!r}))))").format(self.path, sids)
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+        for seed in ("1", "2", "3"):
+            env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=root)
+            out = subprocess.check_output([sys.executable, "-c", script], env=env)
+            self.assertEqual(out.strip(), b"5")
+
+    def _schema_pages(self, pages, latency=0):
+        replay = api.replay_transport(self.path, latency=latency)
+        api.http_transport.set(replay)
+        base = "https://api.steampowered.com/IEconItems_440/{0}/v1?format=json&language=en_US"
+        replay.add(base.format("GetSchemaOverview"), json.dumps({"result": {
+            "status": 1, "items_game_url": "http://example.com/items_game.txt",
+            "qualities": {"normal": 0}, "qualityNames": {"normal": "Normal"}, "attributes": []}}))
+
+        for start in range(0, pages * 2, 2):
+            page = {"result": {"status": 1, "items": [{"defindex": start, "item_name": "A"},
+                                                      {"defindex": start + 1, "item_name": "B"}]}}
+            if start + 2 < pages * 2:
+                page["result"]["next"] = start + 2
+            replay.add(base.format("GetSchemaItems") + "&start=" + str(start), json.dumps(page))
+
+    def test_schema_pages(self):
+        self._schema_pages(2)
+
+        for stream in (False, True):
+            schema = items.schema(440, lang="en_US", stream=stream)
+            self.assertEqual(len(schema), 4)
+            self.assertEqual(schema[3].name, "B")
+
+    def test_schema_deadline(self):
+        self._schema_pages(5, latency=0.1)
+
+        start = time.time()
+        self.assertRaises(api.DeadlineExceededError, items.schema, 440, lang="en_US", deadline=0.15)
+        self.assertLess(time.time() - start, 0.35)
+        self.assertEqual(len(items.schema(440, lang="en_US", deadline=5)), 10)
+
+
+class HooksTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(HooksTestCase, self).setUp()
+        self.events = []
+        api.hooks.register(self.hook)
+
+    def tearDown(self):
+        api.hooks.unregister(self.hook)
+        api.response_cache.set(None)
+        super(HooksTestCase, self).tearDown()
+
+    def hook(self, event, details):
+        self.events.append((event, details))
+
+    def test_events(self):
+        self.route("/IFoo/Bar/v2", headers={"Content-Encoding": "gzip"}, body=gzip.compress(b'{"a": 1}'))
+
+        with api.tagged("foo.bar"):
+            res = api.method_result(self.url("/IFoo/Bar/v2?key=secret"))
+        self.assertEqual(res["a"], 1)
+
+        self.assertEqual([e[0] for e in self.events], ["request_start", "request_end", "decode"])
+        end = self.events[1][1]
+        self.assertEqual((end["interface"], end["method"], end["version"]), ("IFoo", "Bar", 2))
+        self.assertEqual((end["tag"], end["status"], end["error"], end["cache"]), ("foo.bar", 200, None, None))
+        self.assertEqual(end["decoded_bytes"], 8)
+        self.assertGreater(end["wire_bytes"], 8)
+        self.assertNotIn("secret", end["url"])
+        self.assertLessEqual(end["ttfb"], end["duration"])
+        self.assertIsNotNone(end["download_time"])
+        self.assertGreaterEqual(self.events[2][1]["decode_time"], 0)
+        self.assertIsNone(api.tagged.current())
+
+    def test_errors_and_cache(self):
+        self.route("/a")
+        api.response_cache.set(cache.memory_cache(ttl=60))
+
+        api.http_downloader(self.url("/a")).download()
+        api.http_downloader(self.url("/a")).download()
+        self.assertRaises(api.HTTPFileNotFoundError, api.http_downloader(self.url("/missing")).download)
+
+        ends = [details for event, details in self.events if event == "request_end"]
+        self.assertEqual([e["cache"] for e in ends], ["miss", "hit", None])
+        self.assertEqual((ends[2]["status"], ends[2]["error"]), (404, "HTTPFileNotFoundError"))
+
+    def test_async_and_stream(self):
+        self.route("/a", body=b'{"list": [1, 2, 3]}')
+
+        asyncio.run(api.async_method_result(self.url("/a")).call())
+        self.assertEqual(list(api.method_result(self.url("/a")).stream("list")), [1, 2, 3])
+
+        ends = [details for event, details in self.events if event == "request_end"]
+        self.assertEqual([e["status"] for e in ends], [200, 200])
+        self.assertTrue(all(e["ttfb"] is not None for e in ends))
+
+    def test_inactive(self):
+        api.hooks.unregister(self.hook)
+        self.route("/a")
+        api.method_result(self.url("/a"), aggressive=True)
+        self.assertFalse(api.hooks.active())
+        self.assertEqual(self.events, [])
+
+
+class FetchAllTestCase(LocalServerTestCase):
+    def tearDown(self):
+        api.http_transport.set(None)
+        super(FetchAllTestCase, self).tearDown()
+
+    def test_concurrent(self):
+        def slow(handler):
+            time.sleep(0.3)
+            return 200, {}, b'{"a": 1}'
+
+        self.server.routes["/slow"] = slow
+        results = [api.method_result(self.url("/slow?n={0}".format(i))) for i in range(10)]
+        results.append(api.method_result(self.url("/missing")))
+
+        start = time.time()
+        errors = api.fetch_all(results, workers=11)
+        self.assertLess(time.time() - start, 1.5)
+
+        self.assertEqual(errors[:10], [None] * 10)
+        self.assertIsInstance(errors[10], api.HTTPFileNotFoundError)
+        # Already fetched, so nothing more is downloaded
+        self.assertEqual([res["a"] for res in results[:10]], [1] * 10)
+        self.assertEqual(len(self.server.requests), 11)
+        self.assertEqual(api.fetch_all(results[:10]), [None] * 10)
+        self.assertEqual(len(self.server.requests), 11)
+
+    def test_high_level(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        replay = api.replay_transport(path, latency=0.3)
+        api.http_transport.set(replay)
+        api.key.set("testkey")
+        base = "https://api.steampowered.com/IEconItems_440/GetPlayerItems/v1?format=json&SteamID={0}"
+
+        for sid in range(8):
+            replay.add(base.format(sid), json.dumps({"result": {"status": 1, "items": [{"id": sid, "defindex": 5}]}}))
+
+        inventories = [items.inventory(sid, 440) for sid in range(9)]
+        start = time.time()
+        errors = api.fetch_all(inventories, workers=9)
+        self.assertLess(time.time() - start, 1.5)
+
+        self.assertIsInstance(errors[8], api.ReplayMissError)
+        self.assertEqual([next(iter(inv)).id for inv in inventories[:8]], list(range(8)))
+
+    def test_batched(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        replay = api.replay_transport(path)
+        api.http_transport.set(replay)
+        api.key.set("testkey")
+        ids = list(range(1, 11))
+
+        replay.add("https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2?format=json&steamids="
+                   + ",".join(map(str, ids)),
+                   json.dumps({"response": {"players": [{"steamid": str(sid)} for sid in ids]}}))
+        replay.add("https://api.steampowered.com/ISteamUser/GetPlayerBans/v1?format=json&steamids="
+                   + ",".join(map(str, ids)),
+                   json.dumps({"players": [{"SteamId": str(sid), "VACBanned": False} for sid in ids]}))
+
+        # Objects built from a batch are already loaded, nothing is left to fetch
+        objects = list(user.profile_batch(ids)) + list(user.bans_batch(ids))
+        self.assertEqual(api.fetch_all(objects), [None] * 20)
+        self.assertEqual([obj.id64 for obj in objects], ids * 2)
+
+
+class RefresherTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(RefresherTestCase, self).setUp()
+        self.version = 1
+        self.server.routes["/IFoo/Bar/v1"] = self._versioned
+        self.refresher = refresh.refresher(early=0.5, retry=0.1)
+
+    def tearDown(self):
+        self.refresher.stop()
+        super(RefresherTestCase, self).tearDown()
+
+    def _versioned(self, handler):
+        etag = '"{0}"'.format(self.version)
+
+        if self.version < 0:
+            return 500, {}, b''
+        if handler.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b''
+
+        return 200, {"ETag": etag}, json.dumps({"version": self.version}).encode("utf-8")
+
+    def _wait_for(self, condition, timeout=3):
+        deadline = time.time() + timeout
+        while not condition():
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.02)
+
+    def test_refresh(self):
+        self.refresher.register("res", api.method_result, self.url("/IFoo/Bar/v1"), ttl=0.4)
+        first = self.refresher["res"]
+        self.assertEqual(first["version"], 1)
+
+        self.refresher.start()
+        # Unchanged, so revalidated with a conditional request
+        self._wait_for(lambda: len(self.server.requests) > 1)
+        self.assertEqual(self.server.requests[1][1]["If-None-Match"], '"1"')
+        self.assertEqual(self.refresher["res"]["version"], 1)
+
+        self.version = 2
+        self._wait_for(lambda: self.refresher["res"]["version"] == 2)
+        self.assertEqual(first["version"], 1)
+
+        self.version = -1
+        self._wait_for(lambda: self.refresher.stats["failures"] > 0)
+        self.assertEqual(self.refresher["res"]["version"], 2)
+
+    def test_installed_cache(self):
+        api.response_cache.set(cache.memory_cache(ttl=60))
+        self.addCleanup(api.response_cache.set, None)
+
+        self.refresher.register("res", api.method_result, self.url("/IFoo/Bar/v1"), ttl=60)
+        self.refresher["res"]
+        self.version = 2
+        # Still fresh in the cache, but refreshes go to the server anyway
+        self.refresher.refresh("res")
+        self.assertEqual(self.refresher["res"]["version"], 2)
+        self.assertEqual(api.method_result(self.url("/IFoo/Bar/v1"))["version"], 2)
+
+    def test_errors(self):
+        self.version = -1
+        self.refresher.register("res", api.method_result, self.url("/IFoo/Bar/v1"))
+        self.assertRaises(api.HTTPInternalServerError, self.refresher.get, "res")
+        self.assertRaises(KeyError, self.refresher.get, "other")
+
+    def test_async(self):
+        self.refresher.register("res", api.method_result, self.url("/IFoo/Bar/v1"), ttl=0.2)
+
+        async def run():
+            task = asyncio.ensure_future(self.refresher.run())
+            await asyncio.sleep(0.3)
+            task.cancel()
+
+        asyncio.run(run())
+        self.assertEqual(self.refresher["res"]["version"], 1)
+        self.assertGreaterEqual(self.refresher.stats["refreshes"], 2)
+
+
+class PickleTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(PickleTestCase, self).setUp()
+        self.route("/IFoo/Bar/v1", headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+                   body=b'{"a": [1, 2]}')
+
+    def tearDown(self):
+        api.http_transport.set(None)
+        super(PickleTestCase, self).tearDown()
+
+    def test_fetched(self):
+        res = api.method_result(self.url("/IFoo/Bar/v1"), aggressive=True)
+        copy = pickle.loads(pickle.dumps(res, pickle.HIGHEST_PROTOCOL))
+
+        self.assertIs(type(copy), api.method_result)
+        self.assertEqual(copy, {"a": [1, 2]})
+        self.assertEqual((copy.etag, copy.last_modified), ('"v1"', "Mon, 01 Jan 2024 00:00:00 GMT"))
+        self.assertEqual(len(self.server.requests), 1)
+
+        # Fetching again still works
+        copy.call()
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_unfetched(self):
+        copy = pickle.loads(pickle.dumps(api.method_result(self.url("/IFoo/Bar/v1"))))
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(copy["a"], [1, 2])
+
+    def test_high_level(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        api.key.set("testkey")
+        replay = api.replay_transport(path)
+        api.http_transport.set(replay)
+        base = "https://api.steampowered.com/IEconItems_570/GetSchema/v1?format=json&language=en_US"
+        replay.add(base, json.dumps({"result": {
+            "status": 1, "items_game_url": "http://example.com/items_game.txt",
+            "qualities": {"unique": 6}, "qualityNames": {"unique": "Unique"}, "attributes": [],
+            "items": [{"defindex": 5, "item_name": "A"}]}}))
+
+        schema = items.schema(570, lang="en_US")
+        self.assertEqual(len(schema), 1)
+        copy = pickle.loads(pickle.dumps(schema))
+
+        # Served from the pickled data and indexes, nothing to replay from
+        api.http_transport.set(api.replay_transport(tempfile.mkdtemp(dir=path)))
+        self.assertEqual(copy[5].name, "A")
+        self.assertEqual(copy._cache.keys(), schema._cache.keys())
+
+
+class KeyPoolTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(KeyPoolTestCase, self).setUp()
+        self.server.routes["/IFoo/Bar/v1"] = self._keyed
+
+    def tearDown(self):
+        api.key_pool.set(None)
+        super(KeyPoolTestCase, self).tearDown()
+
+    def _keyed(self, handler):
+        apikey = handler.path.split("key=")[-1]
+
+        if apikey == "revoked":
+            return 403, {}, b"Forbidden"
+        if apikey == "busy":
+            return 429, {"Retry-After": "30"}, b""
+
+        return 200, {}, '{{"key": "{0}"}}'.format(apikey).encode("ascii")
+
+    def test_rotation(self):
+        pool = api.rotating_key_pool(["a", "b", "c"])
+        api.key_pool.set(pool)
+
+        used = [api.method_result(self.url("/IFoo/Bar/v1?key=" + pool.peek()))["key"] for i in range(6)]
+        self.assertEqual(sorted(used), ["a", "a", "b", "b", "c", "c"])
+        self.assertEqual(pool.stats["a"]["today"], 2)
+        # Explicit keys are left alone
+        self.assertIn("key=mine", api.interface("IFoo").Bar._build_url(1, {"key": "mine"}))
+
+    def test_counted_when_sent(self):
+        pool = api.rotating_key_pool(["a", "b"], daily_quota=1)
+        api.key_pool.set(pool)
+        api.response_cache.set(cache.memory_cache(ttl=60))
+        self.addCleanup(api.response_cache.set, None)
+
+        # Built but never fetched
+        unfetched = [api.interface("IFoo").Bar() for i in range(10)]
+        self.assertEqual(pool.stats["a"]["today"] + pool.stats["b"]["today"], 0)
+
+        url = self.url("/IFoo/Bar/v1?key=" + pool.peek())
+        api.method_result(url, aggressive=True)
+        before = pool.stats
+
+        # Served from the cache
+        for i in range(3):
+            api.method_result(url, aggressive=True)
+        self.assertEqual(pool.stats, before)
+        self.assertEqual(sum(s["today"] for s in before.values()), 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_revoked(self):
+        pool = api.rotating_key_pool(["revoked", "good"])
+        api.key_pool.set(pool)
+        # So that the revoked key is tried first
+        pool.acquire()
+
+        res = api.method_result(self.url("/IFoo/Bar/v1?key=revoked"), aggressive=True)
+        self.assertEqual(res["key"], "good")
+        self.assertEqual(pool.stats["revoked"]["errors"], 1)
+        self.assertGreater(pool.stats["revoked"]["cooldown"], 3000)
+        self.assertEqual([pool.acquire() for i in range(3)], ["good"] * 3)
+
+        pool.remove("good")
+        self.assertRaises(api.APIKeyMissingError, api.http_downloader(self.url("/IFoo/Bar/v1?key=revoked")).download)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_throttled(self):
+        pool = api.rotating_key_pool(["busy", "good"])
+        api.key_pool.set(pool)
+
+        self.assertRaises(api.HTTPTooManyRequestsError, api.http_downloader(self.url("/IFoo/Bar/v1?key=busy")).download)
+        self.assertAlmostEqual(pool.stats["busy"]["cooldown"], 30, delta=1)
+
+        # Requests built with the throttled key are sent with another one
+        downloader = api.http_downloader(self.url("/IFoo/Bar/v1?key=busy"))
+        self.assertEqual(json.loads(downloader.download().decode("utf-8")), {"key": "good"})
+
+    def test_quota_and_persistence(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        counts = os.path.join(path, "counts.json")
+
+        pool = api.rotating_key_pool(["secret"], daily_quota=3, path=counts)
+        for i in range(3):
+            pool.acquire()
+        self.assertRaises(api.APIKeyMissingError, pool.acquire)
+        pool.save()
+
+        with open(counts) as saved:
+            self.assertNotIn("secret", saved.read())
+        self.assertEqual(api.rotating_key_pool(["secret"], path=counts).stats["secret"]["today"], 3)
+
+
+class CircuitBreakerTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(CircuitBreakerTestCase, self).setUp()
+        self.status = 500
+        self.events = []
+        self.server.routes["/IFoo/Bar/v1"] = lambda handler: (self.status, {}, b'{"a": 1}')
+        self.breaker = api.circuit_breaker(failure_threshold=2, reset_timeout=0.2)
+        api.circuit_breakers.set(self.breaker)
+        api.hooks.register(self.hook)
+
+    def tearDown(self):
+        api.hooks.unregister(self.hook)
+        api.circuit_breakers.set(None)
+        super(CircuitBreakerTestCase, self).tearDown()
+
+    def hook(self, event, details):
+        if event == "circuit_state":
+            self.events.append((details["previous"], details["state"]))
+
+    def download(self):
+        return api.http_downloader(self.url("/IFoo/Bar/v1")).download()
+
+    def test_states(self):
+        for i in range(2):
+            self.assertRaises(api.HTTPInternalServerError, self.download)
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "open")
+
+        self.assertRaises(api.CircuitOpenError, self.download)
+        self.assertEqual(len(self.server.requests), 2)
+
+        # A failed trial request reopens it
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "half_open")
+        self.assertRaises(api.HTTPInternalServerError, self.download)
+        self.assertRaises(api.CircuitOpenError, self.download)
+
+        time.sleep(0.25)
+        self.status = 200
+        self.assertEqual(self.download(), b'{"a": 1}')
+        self.assertEqual(self.breaker.stats, {"IFoo/Bar": {"state": "closed", "failures": 0}})
+        self.assertEqual(self.events, [("closed", "open"), ("open", "half_open"), ("half_open", "open"),
+                                       ("open", "half_open"), ("half_open", "closed")])
+
+    def test_client_errors(self):
+        self.status = 404
+        for i in range(3):
+            self.assertRaises(api.HTTPFileNotFoundError, self.download)
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "closed")
+
+        self.status = 503
+        for i in range(2):
+            self.assertRaises(api.HTTPError, self.download)
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "open")
+        self.assertEqual(self.breaker.state("IFoo/Baz"), "closed")
+
+    def test_async(self):
+        async def fetch():
+            return await api.async_http_downloader(self.url("/IFoo/Bar/v1")).download()
+
+        for i in range(2):
+            self.assertRaises(api.HTTPInternalServerError, asyncio.run, fetch())
+
+        with self.assertRaises(api.CircuitOpenError) as cm:
+            asyncio.run(fetch())
+        self.assertGreater(cm.exception.retry_after, 0)
+
+    def open_circuit(self):
+        for i in range(2):
+            self.assertRaises(api.HTTPInternalServerError, self.download)
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "half_open")
+
+    def test_cancelled_probe(self):
+        self.open_circuit()
+        self.server.routes["/IFoo/Bar/v1"] = lambda handler: time.sleep(0.3) or (200, {}, b'{}')
+
+        async def fetch():
+            return await api.async_http_downloader(self.url("/IFoo/Bar/v1")).download()
+
+        async def cancelled():
+            await asyncio.wait_for(fetch(), 0.05)
+
+        self.assertRaises(asyncio.TimeoutError, asyncio.run, cancelled())
+
+        # The trial slot was given back
+        self.assertEqual(asyncio.run(fetch()), b'{}')
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "closed")
+
+    def test_unsent_probe(self):
+        self.open_circuit()
+
+        with api.deadline(0):
+            self.assertRaises(api.DeadlineExceededError, self.download)
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "half_open")
+        self.assertEqual(len(self.server.requests), 2)
+
+        self.status = 200
+        self.download()
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "closed")
+
+    def test_collector(self):
+        collector = metrics.collector().install()
+        self.addCleanup(collector.uninstall)
+
+        for i in range(2):
+            self.assertRaises(api.HTTPInternalServerError, self.download)
+        self.assertRaises(api.CircuitOpenError, self.download)
+
+        time.sleep(0.25)
+        self.status = 200
+        self.assertEqual(self.download(), b'{"a": 1}')
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "closed")
+        self.assertIn('status="500"} 2', collector.prometheus())
+
+    def test_failing_hook(self):
+        self.open_circuit()
+
+        def broken(event, details):
+            if event == "circuit_state":
+                raise ValueError(details["state"])
+
+        api.hooks.register(broken)
+        try:
+            self.assertRaises(ValueError, self.download)
+            self.assertRaises(api.HTTPInternalServerError, self.download)
+        finally:
+            api.hooks.unregister(broken)
+
+        # Neither left the trial slot taken
+        time.sleep(0.25)
+        self.status = 200
+        self.download()
+        self.assertEqual(self.breaker.state("IFoo/Bar"), "closed")
+
+    def test_reset_in_flight(self):
+        self.status = 200
+        self.server.routes["/IFoo/Bar/v1"] = lambda handler: time.sleep(0.2) or (200, {}, b'{}')
+        threading.Timer(0.1, self.breaker.reset).start()
+
+        self.assertEqual(self.download(), b'{}')
+
+
+class DeadlineTestCase(LocalServerTestCase):
+    def setUp(self):
+        super(DeadlineTestCase, self).setUp()
+        self.server.routes["/slow"] = lambda handler: time.sleep(0.3) or (200, {}, b'{"a": 1}')
+        self.route("/fast")
+
+    def tearDown(self):
+        api.retries.set(None)
+        super(DeadlineTestCase, self).tearDown()
+
+    def test_timeout(self):
+        start = time.time()
+        with api.deadline(0.1):
+            self.assertRaises(api.DeadlineExceededError, api.http_downloader(self.url("/slow")).download)
+        self.assertLess(time.time() - start, 0.25)
+
+        # Out of time before the request is even sent
+        with api.deadline(0):
+            self.assertRaises(api.HTTPTimeoutError, api.http_downloader(self.url("/fast")).download)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_nesting(self):
+        self.assertIsNone(api.deadline.remaining())
+
+        with api.deadline(10):
+            with api.deadline(100):
+                self.assertLessEqual(api.deadline.remaining(), 10)
+            with api.deadline(1):
+                self.assertLessEqual(api.deadline.remaining(), 1)
+            with api.deadline(None):
+                self.assertGreater(api.deadline.remaining(), 1)
+
+        self.assertIsNone(api.deadline.remaining())
+
+    def test_lazy_and_async(self):
+        with api.deadline(0.1):
+            res = api.method_result(self.url("/slow"))
+            downloader = api.async_http_downloader(self.url("/slow"))
+
+        # Requests keep the deadline they were created with
+        self.assertRaises(api.DeadlineExceededError, res.call)
+        self.assertRaises(api.DeadlineExceededError, asyncio.run, downloader.download())
+
+    def test_tasks(self):
+        async def bounded(started, done):
+            with api.deadline(0.1), api.tagged("bounded"):
+                started.set()
+                await done.wait()
+
+        async def other(started, done):
+            await started.wait()
+            downloader = api.async_http_downloader(self.url("/slow"))
+            tag = api.tagged.current()
+            done.set()
+            return tag, await downloader.download()
+
+        async def run():
+            started, done = asyncio.Event(), asyncio.Event()
+            return (await asyncio.gather(bounded(started, done), other(started, done)))[1]
+
+        # One task's deadline and tag don't leak into the other's requests
+        self.assertEqual(asyncio.run(run()), (None, b'{"a": 1}'))
+
+    def test_not_retried(self):
+        api.retries.set(api.retry_policy(max_attempts=5, backoff=0.01))
+
+        with api.deadline(0.1):
+            self.assertRaises(api.DeadlineExceededError, api.http_downloader(self.url("/slow")).download)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(api.retries.get().stats["retries"], 0)
+
+    def test_coalesced_follower(self):
+        self.server.routes["/slower"] = lambda handler: time.sleep(0.6) or (200, {}, b'{}')
+        leader = threading.Thread(target=api.http_downloader(self.url("/slower")).download)
+        leader.start()
+        time.sleep(0.1)
+
+        start = time.time()
+        with api.deadline(0.15):
+            self.assertRaises(api.DeadlineExceededError, api.http_downloader(self.url("/slower")).download)
+        self.assertLess(time.time() - start, 0.35)
+        leader.join()
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_lazy_retry(self):
+        self.route("/busy", code=429, headers={"Retry-After": "2"})
+        api.retries.set(api.retry_policy(max_attempts=3))
+
+        with api.deadline(0.5):
+            res = api.method_result(self.url("/busy"))
+
+        start = time.time()
+        self.assertRaises(api.HTTPTooManyRequestsError, res.call)
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(api.retries.get().stats["retries"], 0)
+
+    def test_lazy_objects(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        replay = api.replay_transport(path)
+        api.http_transport.set(replay)
+        self.addCleanup(api.http_transport.set, None)
+        api.key.set("testkey")
+
+        replay.add("https://api.steampowered.com/IEconItems_570/GetSchema/v1?language=en_US&format=json",
+                   json.dumps({"result": {"status": 1, "items_game_url": "", "qualities": {}, "qualityNames": {},
+                                          "attributes": [], "items": [{"defindex": 1}]}}))
+        replay.add("http://steamcommunity.com/inventory/1/570/2?l=english&count=2000",
+                   json.dumps({"descriptions": [{"classid": "1", "instanceid": "0"}],
+                               "assets": [{"assetid": "5", "classid": "1", "instanceid": "0"}]}))
+
+        schema = items.schema(570, deadline=0.2)
+        inventory = sim.inventory(1, 570, 2, deadline=0.2)
+        time.sleep(0.3)
+
+        # The budget starts with the requests, not with the objects
+        self.assertEqual(len(schema), 1)
+        self.assertEqual(len(inventory), 1)
+
+        api.http_transport.set(api.replay_transport(path, latency=0.3))
+        self.assertRaises(api.DeadlineExceededError, len, items.schema(570, deadline=0.1))
+        self.assertRaises(api.DeadlineExceededError, len, sim.inventory(1, 570, 2, deadline=0.1))
+
+    def test_batches(self):
+        test = self
+
+        class batched(user._batched_request):
+            def _call_method(self, batch):
+                return [api.method_result(test.url("/slow"), aggressive=True)["a"] for sid in batch]
+
+        self.assertEqual(list(batched([1, 2], batchsize=1)), [1, 1])
+
+        results = iter(batched([1, 2, 3], batchsize=1, deadline=0.4))
+        self.assertEqual(next(results), 1)
+        self.assertRaises(api.DeadlineExceededError, list, results)
+
+
+class ThreadSafetyTestCase(LocalServerTestCase):
+    """ Objects shared between threads download once however many use them """
+    threads = 16
+
+    def setUp(self):
+        super(ThreadSafetyTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.downloads = []
+        api.key.set("testkey")
+        # Coalescing would hide duplicate downloads
+        api.request_coalescing.set(False)
+        api.hooks.register(self.hook)
+
+    def tearDown(self):
+        api.hooks.unregister(self.hook)
+        api.request_coalescing.set(True)
+        api.http_transport.set(None)
+        shutil.rmtree(self.path)
+        super(ThreadSafetyTestCase, self).tearDown()
+
+    def hook(self, event, details):
+        if event == "request_start":
+            self.downloads.append(details["url"])
+
+    def contend(self, func):
+        """ Runs func from every thread at once, returns what each got """
+        barrier = threading.Barrier(self.threads)
+        results = [None] * self.threads
+
+        def run(i):
+            barrier.wait()
+            results[i] = func()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_method_result(self):
+        self.server.routes["/slow"] = lambda handler: time.sleep(0.2) or (200, {}, b'{"a": [1, 2, 3]}')
+        res = api.method_result(self.url("/slow"))
+
+        self.assertEqual(self.contend(lambda: len(res["a"])), [3] * self.threads)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(len(api.fetch_all([res])), 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_schema(self):
+        replay = api.replay_transport(self.path, latency=0.1)
+        api.http_transport.set(replay)
+        replay.add("https://api.steampowered.com/IEconItems_570/GetSchema/v1?format=json&language=en_US",
+                   json.dumps({"result": {
+                       "status": 1, "items_game_url": "http://example.com/items_game.txt",
+                       "qualities": {"unique": 6}, "qualityNames": {"unique": "Unique"}, "attributes": [],
+                       "items": [{"defindex": i, "item_name": str(i)} for i in range(1000)]}}))
+
+        for stream in (False, True):
+            del self.downloads[:]
+            schema = items.schema(570, lang="en_US", stream=stream)
+            self.assertEqual(self.contend(lambda: len(schema._schema["items"])), [1000] * self.threads)
+            self.assertEqual(len(self.downloads), 1)
+
+    def test_sim_inventory(self):
+        replay = api.replay_transport(self.path, latency=0.1)
+        api.http_transport.set(replay)
+        replay.add("http://steamcommunity.com/inventory/1/753/6?l=english&count=2000", json.dumps({
+            "assets": [{"assetid": "10", "classid": "1", "instanceid": "0"}],
+            "descriptions": [{"classid": "1", "instanceid": "0", "name": "Card"}]}))
+
+        inv = sim.inventory(1, 753, 6)
+        self.assertEqual(self.contend(lambda: len(inv)), [1] * self.threads)
+        self.assertEqual(len(self.downloads), 1)
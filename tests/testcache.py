@@ -0,0 +1,169 @@
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from steam import cache
+
+
+class CanonicalKeyTestCase(unittest.TestCase):
+    def test_key_excluded(self):
+        a = cache.canonical_key("https://api.steampowered.com/ISteamApps/GetAppList/v2?key=AAA&format=json")
+        b = cache.canonical_key("https://API.steampowered.com/ISteamApps/GetAppList/v2?format=json&key=BBB")
+        self.assertEqual(a, b)
+        self.assertNotIn("AAA", a)
+
+    def test_data(self):
+        url = "https://api.steampowered.com/ISteamApps/GetAppList/v2"
+        self.assertNotEqual(cache.canonical_key(url), cache.canonical_key(url, {"a": 1}))
+        self.assertEqual(cache.canonical_key(url, {"a": 1, "b": 2}), cache.canonical_key(url, {"b": 2, "a": 1}))
+
+
+class DiskCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = cache.disk_cache(os.path.join(self.path, "responses"))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_roundtrip(self):
+        self.cache.set("a", cache.entry(b'{"a": 1}\n{"b": 2}', "Mon, 01 Jan 2024 00:00:00 GMT", '"tag"'))
+
+        # Separate instances share entries, like separate processes would
+        cached = cache.disk_cache(os.path.join(self.path, "responses")).get("a")
+        self.assertEqual(cached.body, b'{"a": 1}\n{"b": 2}')
+        self.assertEqual(cached.last_modified, "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.assertEqual(cached.etag, '"tag"')
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_delete_clear(self):
+        self.cache.set("a", cache.entry(b"a"))
+        self.cache.set("b", cache.entry(b"b"))
+        self.cache.delete("a")
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(os.listdir(os.path.join(self.path, "responses")), [])
+
+
+class MemoryCacheTestCase(unittest.TestCase):
+    def test_lru_eviction(self):
+        store = cache.memory_cache(max_bytes=10)
+        store.set("a", cache.entry(b"aaaa"))
+        store.set("b", cache.entry(b"bbbb"))
+        store.get("a")
+        store.set("c", cache.entry(b"cccc"))
+
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a").body, b"aaaa")
+        self.assertEqual(store.size, 8)
+        self.assertEqual(store.stats["evictions"], 1)
+
+    def test_max_entries(self):
+        store = cache.memory_cache(max_entries=2)
+        for key in "abc":
+            store.set(key, cache.entry(key.encode("ascii")))
+
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get("a"))
+
+    def test_oversized(self):
+        store = cache.memory_cache(max_bytes=2)
+        store.set("a", cache.entry(b"aaaa"))
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.size, 0)
+
+    def test_policies(self):
+        store = cache.memory_cache(ttl=1, policies={"IEconItems_440/GetSchemaItems": 3600,
+                                                    "ISteamUser": 5,
+                                                    "IEconItems_*/GetSchema*": 600})
+        self.assertEqual(store.ttl("IEconItems_440", "GetSchemaItems"), 3600)
+        self.assertEqual(store.ttl("ISteamUser", "GetPlayerSummaries"), 5)
+        self.assertEqual(store.ttl("IEconItems_570", "GetSchema"), 600)
+        self.assertEqual(store.ttl("ISteamApps", "GetAppList"), 1)
+        self.assertEqual(store.ttl(), 1)
+
+
+def _write_entries(path, prefix):
+    store = cache.sqlite_cache(path)
+    for i in range(20):
+        store.set("{0}{1}".format(prefix, i), cache.entry(prefix.encode("ascii") * 100))
+
+
+class SQLiteCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.db = os.path.join(self.path, "cache", "responses.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_roundtrip(self):
+        store = cache.sqlite_cache(self.db)
+        store.set("a", cache.entry(b'\x00{"a": 1}', "Mon, 01 Jan 2024 00:00:00 GMT", '"tag"', 1000))
+        store.set("a", cache.entry(b'{"a": 2}', "Mon, 01 Jan 2024 00:00:00 GMT", '"tag"', 1000))
+
+        cached = cache.sqlite_cache(self.db).get("a")
+        self.assertEqual(cached.body, b'{"a": 2}')
+        self.assertEqual((cached.last_modified, cached.etag, cached.stored),
+                         ("Mon, 01 Jan 2024 00:00:00 GMT", '"tag"', 1000))
+        self.assertIsNone(store.get("b"))
+        self.assertEqual((len(store), store.size), (1, 8))
+        self.assertEqual(store._connection().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+        store.delete("a")
+        self.assertIsNone(store.get("a"))
+        store.set("b", cache.entry(b"b"))
+        store.clear()
+        self.assertEqual(len(store), 0)
+
+    def test_locked_read(self):
+        store = cache.sqlite_cache(self.db, timeout=5)
+        store._touch_interval = 0
+        store.set("a", cache.entry(b"aaaa"))
+
+        writer = sqlite3.connect(self.db, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            # Hits are served without waiting to record the read
+            start = time.time()
+            self.assertEqual(store.get("a").body, b"aaaa")
+            self.assertLess(time.time() - start, 1)
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+
+        self.assertEqual(store._connection().execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+
+    def test_lru_eviction(self):
+        store = cache.sqlite_cache(self.db, max_bytes=10)
+        store._touch_interval = 0
+        store.set("a", cache.entry(b"aaaa"))
+        store.set("b", cache.entry(b"bbbb"))
+        store.get("a")
+        store.set("c", cache.entry(b"cccc"))
+
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a").body, b"aaaa")
+        self.assertEqual(store.size, 8)
+        self.assertEqual(store.stats["evictions"], 1)
+
+        store.set("d", cache.entry(b"d" * 11))
+        self.assertIsNone(store.get("d"))
+
+    def test_processes(self):
+        import multiprocessing
+        cache.sqlite_cache(self.db)
+        workers = [multiprocessing.Process(target=_write_entries, args=(self.db, prefix)) for prefix in "wxyz"]
+
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual([worker.exitcode for worker in workers], [0] * 4)
+        store = cache.sqlite_cache(self.db)
+        self.assertEqual(len(store), 80)
+        self.assertEqual(store.get("x3").body, b"x" * 100)
@@ -0,0 +1,103 @@
+import unittest
+import json
+import shutil
+import tempfile
+import warnings
+from steam import api
+from steam import cache
+from steam import diagnostics
+from steam import user
+
+BANS = "https://api.steampowered.com/ISteamUser/GetPlayerBans/v1?format=json&steamids={0}"
+LEVEL = "https://api.steampowered.com/IPlayerService/GetSteamLevel/v1?format=json&steamid={0}"
+SUMMARIES = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2?format=json&steamids={0}"
+
+
+class NPlusOneTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.replay = api.replay_transport(self.path)
+        api.key.set("testkey")
+        api.http_transport.set(self.replay)
+
+        for sid in range(1, 7):
+            self.replay.add(BANS.format(sid), json.dumps({"players": [
+                {"SteamId": str(sid), "VACBanned": False, "CommunityBanned": False,
+                 "NumberOfVACBans": 0, "DaysSinceLastBan": 0}]}))
+            self.replay.add(LEVEL.format(sid), json.dumps({"response": {"player_level": sid}}))
+
+        self.detector = diagnostics.n_plus_one_detector(threshold=3, window=60).install()
+
+    def tearDown(self):
+        self.detector.uninstall()
+        api.http_transport.set(None)
+        api.response_cache.set(None)
+        shutil.rmtree(self.path)
+
+    def loop(self, func, count=6):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            results = [func(sid) for sid in range(1, count + 1)]
+
+        return results, [w for w in caught if issubclass(w.category, diagnostics.NPlusOneWarning)]
+
+    def test_warning(self):
+        results, caught = self.loop(lambda sid: user.bans(sid).vac)
+        self.assertEqual(results, [False] * 6)
+
+        # Once per window, pointing at the loop
+        self.assertEqual(len(caught), 1)
+        message = str(caught[0].message)
+        self.assertIn("ISteamUser/GetPlayerBans was fetched 4 times", message)
+        self.assertIn("user.py", message)
+        self.assertIn("user.bans_batch", message)
+        self.assertEqual(caught[0].filename, __file__.replace(".pyc", ".py"))
+
+        stats = self.detector.stats["ISteamUser/GetPlayerBans"]
+        self.assertEqual((stats["fetches"], stats["warnings"]), (6, 1))
+        self.assertEqual(list(stats["sites"].values()), [6])
+
+    def test_records(self):
+        self.loop(lambda sid: user.bans(sid).vac, count=2)
+        record = self.detector.records[-1]
+
+        self.assertIn("_bans", record["trigger"])
+        self.assertIn("testdiagnostics.py", record["site"])
+        self.assertEqual(record["tag"], "user.bans")
+        self.assertNotIn("testkey", record["url"])
+        self.assertIn(record["trigger"], record["stack"])
+
+    def test_without_batched_call(self):
+        fetch = api.interface("IPlayerService").GetSteamLevel
+        results, caught = self.loop(lambda sid: fetch(steamid=sid)["response"]["player_level"])
+        self.assertEqual(results, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(len(caught), 1)
+        self.assertNotIn("fetches many at once", str(caught[0].message))
+
+    def test_batched_levels(self):
+        ids = list(range(1, 7))
+        self.replay.add(SUMMARIES.format(",".join(map(str, ids))), json.dumps({"response": {"players": [
+            {"steamid": str(sid), "personaname": str(sid)} for sid in ids]}}))
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            levels = [p.level for p in user.profile_batch(ids)]
+
+        # Levels take a call each, but the summaries came in one
+        self.assertEqual(levels, ids)
+        self.assertEqual(self.detector.stats["ISteamUser/GetPlayerSummaries"]["fetches"], 1)
+        self.assertEqual(len(caught), 1)
+        self.assertIn("IPlayerService/GetSteamLevel", str(caught[0].message))
+        self.assertNotIn("user.profile_batch", str(caught[0].message))
+
+    def test_quiet(self):
+        api.response_cache.set(cache.memory_cache(ttl=60))
+
+        # Cache hits aren't fetches
+        results, caught = self.loop(lambda sid: user.bans(1).vac)
+        self.assertEqual(caught, [])
+
+        self.detector.ignore.add("ISteamUser/GetPlayerBans")
+        results, caught = self.loop(lambda sid: user.bans(sid).vac)
+        self.assertEqual(caught, [])
+        self.assertEqual(self.detector.stats["ISteamUser/GetPlayerBans"]["fetches"], 1)
@@ -0,0 +1,90 @@
+import unittest
+import socket
+import shutil
+import tempfile
+from steam import api
+from steam import metrics
+
+
+def _end(interface="ISteamUser", method="GetPlayerSummaries", duration=0.2, status=200,
+         error=None, cache=None, wire_bytes=100, decoded_bytes=400, tag=None):
+    return {"url": "", "interface": interface, "method": method, "version": 2, "tag": tag,
+            "status": status, "error": error, "cache": cache, "wire_bytes": wire_bytes,
+            "decoded_bytes": decoded_bytes, "ttfb": 0.1, "download_time": 0.05, "duration": duration}
+
+
+class CollectorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.collector = metrics.collector(buckets=(0.1, 1))
+
+    def test_prometheus(self):
+        self.collector("request_end", _end(duration=0.05))
+        self.collector("request_end", _end(duration=0.5, cache="miss"))
+        self.collector("request_end", _end(duration=3, status=None, error="HTTPTimeoutError", wire_bytes=0))
+        self.collector("decode", dict(_end(), decode_time=0.01))
+        text = self.collector.prometheus()
+        labels = 'interface="ISteamUser",method="GetPlayerSummaries"'
+
+        self.assertIn('steamodd_request_duration_seconds_bucket{' + labels + ',le="0.1"} 1\n', text)
+        self.assertIn('steamodd_request_duration_seconds_bucket{' + labels + ',le="1.0"} 2\n', text)
+        self.assertIn('steamodd_request_duration_seconds_bucket{' + labels + ',le="+Inf"} 3\n', text)
+        self.assertIn('steamodd_request_duration_seconds_count{' + labels + '} 3\n', text)
+        self.assertIn('steamodd_decode_duration_seconds_count{' + labels + '} 1\n', text)
+        self.assertIn('steamodd_requests_total{' + labels + ',status="200"} 2\n', text)
+        self.assertIn('steamodd_errors_total{' + labels + ',error="HTTPTimeoutError"} 1\n', text)
+        self.assertIn('steamodd_cache_total{' + labels + ',outcome="miss"} 1\n', text)
+        self.assertIn('steamodd_wire_bytes_total{' + labels + '} 200\n', text)
+        self.assertIn('steamodd_decoded_bytes_total{' + labels + '} 1200\n', text)
+
+        self.collector.reset()
+        self.assertNotIn("ISteamUser", self.collector.prometheus())
+
+    def test_other_events(self):
+        self.collector("request_start", {"url": "", "interface": None, "method": None})
+        self.collector("circuit_state", {"circuit": "example.com", "state": "open",
+                                         "previous": "closed", "failures": 1})
+        self.assertNotIn("circuit", self.collector.prometheus())
+
+    def test_installed(self):
+        path = tempfile.mkdtemp()
+        replay = api.replay_transport(path)
+        replay.add("http://example.com/IFoo/Bar/v1", b'{"a": 1}')
+        api.http_transport.set(replay)
+        self.collector.install()
+
+        try:
+            api.method_result("http://example.com/IFoo/Bar/v1", aggressive=True)
+            self.assertRaises(api.ReplayMissError, api.http_downloader("http://example.com/IFoo/Baz/v1").download)
+        finally:
+            self.collector.uninstall()
+            api.http_transport.set(None)
+            shutil.rmtree(path)
+
+        text = self.collector.prometheus()
+        self.assertIn('steamodd_requests_total{interface="IFoo",method="Bar",status="200"} 1\n', text)
+        self.assertIn('steamodd_errors_total{interface="IFoo",method="Baz",error="ReplayMissError"} 1\n', text)
+
+
+class StatsdTestCase(unittest.TestCase):
+    def setUp(self):
+        self.daemon = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.daemon.bind(("127.0.0.1", 0))
+        self.daemon.settimeout(5)
+        self.exporter = metrics.statsd_exporter(port=self.daemon.getsockname()[1], prefix="app")
+
+    def tearDown(self):
+        self.exporter.close()
+        self.daemon.close()
+
+    def test_push(self):
+        self.exporter("request_end", _end(error="HTTPStale", status=304))
+        lines = self.daemon.recv(65536).decode("utf-8").split('\n')
+
+        self.assertIn("app.ISteamUser.GetPlayerSummaries.duration:200.000|ms", lines)
+        self.assertIn("app.ISteamUser.GetPlayerSummaries.status.304:1|c", lines)
+        self.assertIn("app.ISteamUser.GetPlayerSummaries.errors.HTTPStale:1|c", lines)
+        self.assertIn("app.ISteamUser.GetPlayerSummaries.wire_bytes:100|c", lines)
+
+    def test_tag_fallback(self):
+        lines = self.exporter.lines("request_end", _end(interface=None, method=None, tag="sim.inventory"))
+        self.assertEqual(lines[0], "app.sim.inventory.request.duration:200.000|ms")